@@ -1,18 +1,121 @@
+import json
 import typing as t
+from functools import lru_cache
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
-from core.llm.llm_service import llm_service_factory
+from core.llm.llm_service import LLMService, llm_service_factory
+from core.retrieval.vector_search import VectorSearchInterface, vector_search_factory
 
 predict_router = r = APIRouter()
 
-llm_service = llm_service_factory()
+
+# Built on first use (or by the server lifespan), never at import time, so
+# importing this module needs neither credentials nor the search index
+@lru_cache(maxsize=None)
+def get_llm_service() -> LLMService:
+    return llm_service_factory()
+
+
+@lru_cache(maxsize=None)
+def get_vector_search() -> VectorSearchInterface:
+    return vector_search_factory()
+
+
+class ChatRequest(BaseModel):
+    prompt: str
+    temperature: float = Field(default=0.7, ge=0, le=2)
+    max_tokens: int = Field(default=1000, ge=1)
+
+
+class SearchRequest(BaseModel):
+    query: str
+    top_k: int = Field(default=5, ge=1, le=100)
+    app: t.Optional[str] = None
+    article_type: t.Optional[str] = None
+
+
+class SearchHit(BaseModel):
+    chunk_id: str
+    item_id: str
+    # cosine similarity, None for hybrid hits found by BM25 only
+    score: t.Optional[float]
+    title: str
+    # reciprocal rank fusion score the hybrid hits are ordered by
+    rrf_score: t.Optional[float] = None
+
+
+class SearchResponse(BaseModel):
+    query: str
+    results: t.List[SearchHit]
 
 
 @r.post("/chat/llm", response_model=t.Dict)
-async def think() -> t.Dict:
-    predict_response = llm_service.predict("Hello, how are you?")
-    embedding_response = llm_service.get_embeddings("Hello, how are you?")
+async def think(llm_service: LLMService = Depends(get_llm_service)) -> t.Dict:
+    predict_response = await llm_service.predict("Hello, how are you?")
+    embedding_response = await llm_service.get_embeddings("Hello, how are you?")
     # return predict_response
 
     return {"message": "Hello, how are you?", "response": embedding_response}
+
+
+@r.post("/chat/llm/stream")
+async def think_stream(
+    chat_request: ChatRequest,
+    request: Request,
+    llm_service: LLMService = Depends(get_llm_service),
+):
+    """
+    Server-Sent Events stream of the answer: one `data: {"token": ...}` event
+    per text delta, then `data: [DONE]`. When the client goes away the
+    upstream stream is closed, which stops the generation.
+    """
+
+    async def event_stream():
+        tokens = llm_service.predict_stream(
+            chat_request.prompt,
+            temperature=chat_request.temperature,
+            max_tokens=chat_request.max_tokens,
+        )
+        try:
+            async for token in tokens:
+                if await request.is_disconnected():
+                    return
+                yield f"data: {json.dumps({'token': token})}\n\n"
+            yield "data: [DONE]\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        finally:
+            await tokens.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@r.get("/chat/llm/cache", response_model=t.Dict)
+async def cache_stats(
+    llm_service: LLMService = Depends(get_llm_service),
+) -> t.Dict:
+    return llm_service.cache_stats()
+
+
+@r.post("/search", response_model=SearchResponse)
+async def search(
+    request: SearchRequest,
+    llm_service: LLMService = Depends(get_llm_service),
+    vector_search: VectorSearchInterface = Depends(get_vector_search),
+) -> SearchResponse:
+    embeddings = await llm_service.get_embeddings(request.query)
+    hits = await vector_search.search(
+        embeddings[0],
+        top_k=request.top_k,
+        app=request.app,
+        article_type=request.article_type,
+        query_text=request.query,
+    )
+    return SearchResponse(query=request.query, results=hits)
@@ -1,31 +1,142 @@
 import os
 
-from decouple import config
-
 PROJECT_NAME = "ragflow"
 API_DOCS = "/api/docs"
 OPENAPI_DOCS = "/api/openapi.json"
 INDEX_NAME = "ragflow_docs"
 INDEX_TYPE = os.environ.get("VECSIM_INDEX_TYPE", "HNSW")
+VECTOR_DIM = int(os.environ.get("VECTOR_DIM", 1536))
+VECTOR_DISTANCE_METRIC = os.environ.get("VECTOR_DISTANCE_METRIC", "COSINE")
+
+# HNSW graph parameters: higher values trade memory/build time for recall
+HNSW_M = int(os.environ.get("HNSW_M", 16))
+HNSW_EF_CONSTRUCTION = int(os.environ.get("HNSW_EF_CONSTRUCTION", 200))
+HNSW_EF_RUNTIME = int(os.environ.get("HNSW_EF_RUNTIME", 10))
+# FLAT (brute-force) index parameters
+FLAT_BLOCK_SIZE = int(os.environ.get("FLAT_BLOCK_SIZE", 1024))
 
 # use for openai api decorator for retry
-OPENAI_BACKOFF = os.environ.get("OPENAI_BACKOFF", 0.5)
-OPENAI_MAX_RETRIES = os.environ.get("OPENAI_MAX_RETRIES", 3)
+OPENAI_BACKOFF = float(os.environ.get("OPENAI_BACKOFF", 0.5))
+OPENAI_MAX_BACKOFF = float(os.environ.get("OPENAI_MAX_BACKOFF", 20))
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", 3))
+# process-wide retry budget: retries allowed as a fraction of calls, plus a floor
+OPENAI_RETRY_BUDGET_RATIO = float(os.environ.get("OPENAI_RETRY_BUDGET_RATIO", 0.2))
+OPENAI_RETRY_BUDGET_MIN_PER_SECOND = float(
+    os.environ.get("OPENAI_RETRY_BUDGET_MIN_PER_SECOND", 1)
+)
+# circuit breaker: consecutive failures before failing fast, and for how long
+OPENAI_CIRCUIT_FAILURE_THRESHOLD = int(
+    os.environ.get("OPENAI_CIRCUIT_FAILURE_THRESHOLD", 5)
+)
+OPENAI_CIRCUIT_RESET_TIMEOUT = float(os.environ.get("OPENAI_CIRCUIT_RESET_TIMEOUT", 30))
+
+# shared async HTTP client used by the server to call OpenAI
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20)
+)
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", 30))
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", 60))
+
+# exact-match cache of chat completions, optionally shared through redis
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "false").lower() == "true"
+LLM_CACHE_REDIS = os.environ.get("LLM_CACHE_REDIS", "false").lower() == "true"
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 1024))
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", 3600))
+
+# semantic cache: reuse the answer of a previous prompt with a similar embedding
+SEMANTIC_CACHE_ENABLED = (
+    os.environ.get("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+)
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", 0.95))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", 1000))
+SEMANTIC_CACHE_TTL = float(os.environ.get("SEMANTIC_CACHE_TTL", 3600))
+
+# micro-batching of the query embeddings requested concurrently by the server
+EMBEDDING_BATCH_ENABLED = (
+    os.environ.get("EMBEDDING_BATCH_ENABLED", "true").lower() == "true"
+)
+EMBEDDING_BATCH_MAX_SIZE = int(os.environ.get("EMBEDDING_BATCH_MAX_SIZE", 64))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.environ.get("EMBEDDING_BATCH_MAX_WAIT_MS", 5))
+
+# embedding generation during data prep: parallel batches and account quotas
+EMBEDDING_CONCURRENCY = int(os.environ.get("EMBEDDING_CONCURRENCY", 4))
+EMBEDDING_MAX_RETRIES = int(os.environ.get("EMBEDDING_MAX_RETRIES", 6))
+OPENAI_EMBEDDING_RPM = int(os.environ.get("OPENAI_EMBEDDING_RPM", 3000))
+OPENAI_EMBEDDING_TPM = int(os.environ.get("OPENAI_EMBEDDING_TPM", 1000000))
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "text-embedding-ada-002")
+# sqlite file, next to the source data, caching embeddings by text hash
+EMBEDDING_CACHE_FILE = os.environ.get("EMBEDDING_CACHE_FILE", "embedding_cache.sqlite3")
+# per-request limits of the embeddings endpoint (text-embedding-ada-002)
+EMBEDDING_MAX_INPUT_TOKENS = int(os.environ.get("EMBEDDING_MAX_INPUT_TOKENS", 8191))
+EMBEDDING_MAX_BATCH_TOKENS = int(os.environ.get("EMBEDDING_MAX_BATCH_TOKENS", 300000))
+EMBEDDING_MAX_BATCH_ITEMS = int(os.environ.get("EMBEDDING_MAX_BATCH_ITEMS", 2048))
+# near-duplicate documents (MinHash estimated Jaccard of their word shingles
+# at least DEDUP_THRESHOLD) are folded into one canonical copy before embedding
+DEDUP_ENABLED = os.environ.get("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", 0.85))
+DEDUP_NUM_PERM = int(os.environ.get("DEDUP_NUM_PERM", 128))
+DEDUP_SHINGLE_SIZE = int(os.environ.get("DEDUP_SHINGLE_SIZE", 3))
+# documents are embedded and retrieved as overlapping chunks (estimated tokens)
+CHUNK_MAX_TOKENS = int(os.environ.get("CHUNK_MAX_TOKENS", 1024))
+CHUNK_OVERLAP = int(os.environ.get("CHUNK_OVERLAP", 128))
 
 REDIS_HOST = os.environ.get("REDIS_HOST", "localhost")
 REDIS_PORT = os.environ.get("REDIS_PORT", 6379)
 REDIS_PASSWORD = os.environ.get("REDIS_PASSWORD")
 
-# from .env
-OPENAI_API_KEY = config("OPENAI_API_KEY")
-OPENAI_API_MODEL = config("OPENAI_API_MODEL")
-
 REDIS_DB = os.environ.get("REDIS_DB", 0)
-if REDIS_PASSWORD and REDIS_PASSWORD != "":
-    print("REDIS_PASSWORD", REDIS_PASSWORD)
+if os.environ.get("REDIS_URL"):
+    # a full URL wins over the host/port/password settings
+    REDIS_URL = os.environ["REDIS_URL"]
+elif REDIS_PASSWORD and REDIS_PASSWORD != "":
     REDIS_URL = f"redis://:{REDIS_PASSWORD}@{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
 else:
     REDIS_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
 
+# connection pools shared by every module, one sync and one asyncio
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", 50))
+REDIS_SOCKET_TIMEOUT = float(os.environ.get("REDIS_SOCKET_TIMEOUT", 5))
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.environ.get("REDIS_SOCKET_CONNECT_TIMEOUT", 2))
+# idle connections are pinged before reuse after this many seconds
+REDIS_HEALTH_CHECK_INTERVAL = int(os.environ.get("REDIS_HEALTH_CHECK_INTERVAL", 30))
+
+# redis bulk loading
+REDIS_DOC_PREFIX = "doc:"
+REDIS_BATCH_SIZE = int(os.environ.get("REDIS_BATCH_SIZE", 500))
+
 API_V1_STR = "/api/v1"
+# uvicorn worker processes when DEPLOYMENT=prod, dev always runs one with reload
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", os.cpu_count() or 1))
 DATA_LOCATION = os.environ.get("DATA_LOCATION", "data")
+# "redis" for RediSearch KNN, "numpy" for the in-process retriever over DATA_LOCATION
+SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "redis")
+# "int8" searches int8 codes (4x smaller) and re-ranks the best
+# QUANTIZED_RERANK_FACTOR * top_k candidates exactly, numpy backend only
+EMBEDDING_QUANTIZATION = os.environ.get("EMBEDDING_QUANTIZATION", "none")
+QUANTIZED_RERANK_FACTOR = int(os.environ.get("QUANTIZED_RERANK_FACTOR", 4))
+# > 0 projects the stored vectors and the queries on that many PCA components,
+# numpy backend only, not combined with EMBEDDING_QUANTIZATION
+EMBEDDING_PCA_DIM = int(os.environ.get("EMBEDDING_PCA_DIM", 0))
+# BM25 over DATA_LOCATION/bm25_index.json fused with the vector hits (RRF).
+# Opt-in: the hits are then ordered by their rrf_score, not the cosine score
+HYBRID_SEARCH_ENABLED = (
+    os.environ.get("HYBRID_SEARCH_ENABLED", "false").lower() == "true"
+)
+HYBRID_RRF_K = int(os.environ.get("HYBRID_RRF_K", 60))
+# hits taken from each retriever before fusion
+HYBRID_CANDIDATES = int(os.environ.get("HYBRID_CANDIDATES", 20))
+
+# read from the environment or .env on first access, so importing this module
+# never touches the filesystem and does not require the credentials
+_LAZY_SETTINGS = ("OPENAI_API_KEY", "OPENAI_API_MODEL")
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_SETTINGS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from decouple import config
+
+    value = config(name)
+    globals()[name] = value
+    return value
@@ -1,16 +1,95 @@
+import httpx
 import redis
+import redis.asyncio
 
-from core.common.config import REDIS_HOST, REDIS_URL
+from .config import (
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_TIMEOUT,
+    REDIS_HEALTH_CHECK_INTERVAL,
+    REDIS_MAX_CONNECTIONS,
+    REDIS_SOCKET_CONNECT_TIMEOUT,
+    REDIS_SOCKET_TIMEOUT,
+    REDIS_URL,
+)
 
-_redis_conn = None
+_redis_pool = None
+_async_redis_pool = None
 _pg_conn = None
+_http_client = None
 
 
-def get_redis_instance():
-    """Static access method."""
-    global _redis_conn
+def _redis_pool_options() -> dict:
+    return {
+        "max_connections": REDIS_MAX_CONNECTIONS,
+        "socket_timeout": REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": REDIS_SOCKET_CONNECT_TIMEOUT,
+        "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL,
+    }
 
-    if _redis_conn is None:
-        print("REDIS_URL", REDIS_HOST)
-        _redis_conn = redis.from_url(REDIS_URL)
-    return _redis_conn
+
+def get_redis_instance() -> redis.Redis:
+    """
+    Blocking Redis client over the process-wide connection pool.
+
+    Clients are cheap, the pool owns the sockets: every caller shares at most
+    REDIS_MAX_CONNECTIONS connections. Nothing connects until the first command.
+    """
+    global _redis_pool
+
+    if _redis_pool is None:
+        _redis_pool = redis.ConnectionPool.from_url(REDIS_URL, **_redis_pool_options())
+    return redis.Redis(connection_pool=_redis_pool)
+
+
+def get_async_redis_instance() -> redis.asyncio.Redis:
+    """
+    asyncio Redis client over the process-wide async connection pool, for the
+    server routes. Commands are awaited and never block the event loop.
+    """
+    global _async_redis_pool
+
+    if _async_redis_pool is None:
+        _async_redis_pool = redis.asyncio.ConnectionPool.from_url(
+            REDIS_URL, **_redis_pool_options()
+        )
+    return redis.asyncio.Redis(connection_pool=_async_redis_pool)
+
+
+async def close_redis_pools():
+    global _redis_pool, _async_redis_pool
+
+    if _async_redis_pool is not None:
+        await _async_redis_pool.disconnect()
+        _async_redis_pool = None
+    if _redis_pool is not None:
+        _redis_pool.disconnect()
+        _redis_pool = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Shared async HTTP client. Its connection pool keeps TLS connections alive
+    between requests, so only the first call to a host pays the handshake.
+    """
+    global _http_client
+
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=HTTP_TIMEOUT,
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
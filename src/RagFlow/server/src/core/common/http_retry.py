@@ -1,59 +1,296 @@
+import asyncio
+import functools
+import inspect
 import logging
+import threading
 import time
 from random import random
+from typing import Callable, Optional
 
-import requests
+from .metrics import retries_rejected_total, retries_total
 
 logger = logging.getLogger(__name__)
 
 
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the circuit breaker is open."""
+
+    def __init__(self, message: str):
+        self.message = message
+
+
+class RetryBudget:
+    """
+    Process-wide cap on retries, shared by every function decorated with it.
+
+    Each call deposits `ratio` tokens and each retry withdraws one, so retries
+    stay under ~ratio of the traffic; `min_retries_per_second` keeps a small
+    floor so low-traffic processes can still retry. When the budget is empty
+    failures are raised immediately instead of amplifying an outage.
+    """
+
+    def __init__(
+        self,
+        ratio: float = 0.2,
+        min_retries_per_second: float = 1.0,
+        max_balance: float = 10.0,
+    ):
+        self.ratio: float = ratio
+        self.min_retries_per_second: float = min_retries_per_second
+        self.max_balance: float = max_balance
+        self._balance: float = max_balance
+        self._updated_at: float = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, amount: float = 0.0):
+        now = time.monotonic()
+        amount += (now - self._updated_at) * self.min_retries_per_second
+        self._balance = min(self.max_balance, self._balance + amount)
+        self._updated_at = now
+
+    def record_call(self):
+        with self._lock:
+            self._refill(self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+
+class CircuitBreaker:
+    """
+    Fail fast while an upstream is down.
+
+    After `failure_threshold` consecutive failed calls the circuit opens and
+    calls raise CircuitOpenError without reaching the upstream. After
+    `reset_timeout_in_seconds` it goes half-open: a single probe call is let
+    through while the others keep failing fast, a success closes the circuit
+    and a failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self, failure_threshold: int = 5, reset_timeout_in_seconds: float = 30
+    ):
+        self.failure_threshold: int = failure_threshold
+        self.reset_timeout_in_seconds: float = reset_timeout_in_seconds
+        self.state: str = self.CLOSED
+        self._failures: int = 0
+        self._opened_at: float = 0.0
+        self._probe_in_flight: bool = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """
+        Raise CircuitOpenError if the call must not reach the upstream.
+
+        Returns:
+            bool: True if the call is the half-open probe, it must then end with
+            record_success, record_failure or release_probe
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return False
+            if self.state == self.OPEN:
+                remaining = (
+                    self._opened_at + self.reset_timeout_in_seconds - time.monotonic()
+                )
+                if remaining > 0:
+                    raise CircuitOpenError(
+                        f"Circuit open, upstream calls blocked for {remaining:.1f} more seconds"
+                    )
+                self.state = self.HALF_OPEN
+            elif self._probe_in_flight:
+                raise CircuitOpenError("Circuit half-open, waiting for the probe call")
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            self.state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self._probe_in_flight = False
+            if self.state == self.OPEN:
+                # a call started before the circuit opened, keep the reset time
+                return
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                logger.warning("Circuit opened after %s failures", self._failures)
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release_probe(self):
+        """End a probe that told nothing about the upstream, the next call probes."""
+        with self._lock:
+            self._probe_in_flight = False
+
+
+def _get_sleep_time(
+    error: Exception,
+    num_retries: int,
+    backoff_in_seconds: float,
+    max_backoff_in_seconds: float,
+) -> float:
+    """
+    Full jitter: a random delay in [0, min(cap, base * 2^n)], so clients that
+    failed together do not retry together. A server provided Retry-After (the
+    `retry_after` attribute of the error) is used as a lower bound.
+    """
+    sleep_time = random() * min(
+        max_backoff_in_seconds, backoff_in_seconds * 2**num_retries
+    )
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is not None:
+        sleep_time = max(sleep_time, retry_after)
+    return sleep_time
+
+
 def retry_with_exponential_backoff(
     backoff_in_seconds: float = 1,
     max_retries: int = 10,
     errors: tuple = (Exception,),
+    max_backoff_in_seconds: float = 60,
+    retry_budget: Optional[RetryBudget] = None,
+    circuit_breaker: Optional[CircuitBreaker] = None,
+    is_retryable: Optional[Callable[[Exception], bool]] = None,
 ):
     """
     Decorator to retry a function with exponential backoff.
+    Works on both regular functions and coroutine functions, the latter
+    sleeping with asyncio.sleep so the event loop is never blocked.
     :param backoff_in_seconds: The initial backoff in seconds.
     :param max_retries: The maximum number of retries.
     :param errors: The errors to catch retry on.
+    :param max_backoff_in_seconds: The cap of a single backoff.
+    :param retry_budget: Optional budget shared with other callers, no retry is
+        made once it is exhausted.
+    :param circuit_breaker: Optional breaker shared with other callers, calls
+        fail fast with CircuitOpenError while it is open. A call that gives up
+        counts as one failure, however many attempts it made.
+    :param is_retryable: Optional predicate on the caught errors; those it
+        rejects are raised at once, without counting against the breaker.
     """
 
     def decorator(function):
-        def wrapper(*args, **kwargs):
-            # Initialize variables
-            num_retries = 0
-
-            # Loop until a successful response or max_retries is hit or an
-            # exception is raised
-            while True:
+        def start_call() -> bool:
+            """Admit the call, return True if it is the half-open probe."""
+            probe = False
+            if circuit_breaker:
                 try:
-                    print("Attempting to call function")
-                    return function(*args, **kwargs)
-
-                # Retry on specified errors
-                except errors as e:
-                    # Check if max retries has been reached
-                    if num_retries > max_retries:
-                        raise Exception(
-                            f"Maximum number of retries ({max_retries}) exceeded."
-                        )
-
-                    # Increment the delay
-                    sleep_time = backoff_in_seconds * 2**num_retries + random()
-
-                    # Sleep for the delay
-                    logger.warning(
-                        "%s - %s, retry %s in %s seconds...",
-                        e.__class__.__name__,
-                        str(e),  # Change to str(e) for  example below
-                        function.__name__,
-                        "{0:.2f}".format(sleep_time),
+                    probe = circuit_breaker.before_call()
+                except CircuitOpenError:
+                    retries_rejected_total.inc(
+                        function=function.__name__, reason="circuit_open"
+                    )
+                    raise
+            if retry_budget:
+                retry_budget.record_call()
+            return probe
+
+        def on_success():
+            if circuit_breaker:
+                circuit_breaker.record_success()
+
+        def on_error(e: Exception, num_retries: int, probe: bool) -> float:
+            """Return the delay before the next attempt, or raise."""
+            if is_retryable and not is_retryable(e):
+                raise e
+
+            # Check if max retries has been reached
+            if num_retries > max_retries:
+                reason = "max_retries"
+            elif probe:
+                # a failed probe reopens the circuit without retrying
+                reason = "probe"
+            elif circuit_breaker and circuit_breaker.state == CircuitBreaker.OPEN:
+                reason = "circuit_open"
+            elif retry_budget and not retry_budget.try_spend():
+                logger.warning(
+                    "Retry budget exhausted, not retrying %s", function.__name__
+                )
+                reason = "budget"
+            else:
+                reason = None
+            if reason:
+                if circuit_breaker:
+                    circuit_breaker.record_failure()
+                if reason == "max_retries":
+                    raise Exception(
+                        f"Maximum number of retries ({max_retries}) exceeded."
+                    ) from e
+                if reason != "probe":
+                    retries_rejected_total.inc(
+                        function=function.__name__, reason=reason
                     )
-                    time.sleep(sleep_time)
+                raise e
+
+            retries_total.inc(function=function.__name__, error=e.__class__.__name__)
 
-                    # Increment retries
-                    num_retries += 1
+            sleep_time = _get_sleep_time(
+                e, num_retries, backoff_in_seconds, max_backoff_in_seconds
+            )
+            logger.warning(
+                "%s - %s, retry %s in %s seconds...",
+                e.__class__.__name__,
+                str(e),
+                function.__name__,
+                "{0:.2f}".format(sleep_time),
+            )
+            return sleep_time
+
+        def end_call(probe: bool):
+            # the probe raised an error that is not retried, let another call probe
+            if probe:
+                circuit_breaker.release_probe()
+
+        if inspect.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                probe = start_call()
+                try:
+                    num_retries = 0
+                    while True:
+                        try:
+                            result = await function(*args, **kwargs)
+                        except errors as e:
+                            await asyncio.sleep(on_error(e, num_retries, probe))
+                            num_retries += 1
+                            continue
+                        on_success()
+                        return result
+                finally:
+                    end_call(probe)
+
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            probe = start_call()
+            try:
+                num_retries = 0
+                while True:
+                    try:
+                        result = function(*args, **kwargs)
+                    except errors as e:
+                        time.sleep(on_error(e, num_retries, probe))
+                        num_retries += 1
+                        continue
+                    on_success()
+                    return result
+            finally:
+                end_call(probe)
 
         return wrapper
 
@@ -61,6 +298,8 @@ def retry_with_exponential_backoff(
 
 
 if __name__ == "__main__":
+    import requests
+
     # Apply the decorator to a function that might fail temporarily
     @retry_with_exponential_backoff(
         errors=(requests.RequestException,)  # Specify the exact exceptions to catch
@@ -0,0 +1,197 @@
+"""
+Minimal in-process metrics exposed in the Prometheus text format.
+
+The metrics are per process: with several uvicorn workers each worker serves
+its own values on /metrics, so scrape every worker or aggregate in Prometheus.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name: str = name
+        self.documentation: str = documentation
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...]) -> List[Tuple[str, str]]:
+        return list(zip(self.labelnames, key))
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return self.header() + [
+            f"{self.name}{_format_labels(self._labels(key))} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets)) + (float("inf"),)
+        # label values -> (per-bucket counts, sum)
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(
+                key, ([0] * len(self.buckets), [0.0])
+            )
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block in seconds."""
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = {key: (list(c), t[0]) for key, (c, t) in self._values.items()}
+        lines = self.header()
+        for key, (counts, total) in sorted(values.items()):
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                bucket_labels = _format_labels(labels + [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(
+                f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}"
+            )
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+http_request_duration = REGISTRY.register(
+    Histogram(
+        "ragflow_http_request_duration_seconds",
+        "Time to produce the response headers, by route.",
+        ["method", "route", "status"],
+    )
+)
+openai_request_duration = REGISTRY.register(
+    Histogram(
+        "ragflow_openai_request_duration_seconds",
+        "Latency of OpenAI API calls, by endpoint and HTTP status.",
+        ["endpoint", "status"],
+    )
+)
+retries_total = REGISTRY.register(
+    Counter(
+        "ragflow_retries_total",
+        "Retries made by retry_with_exponential_backoff.",
+        ["function", "error"],
+    )
+)
+retries_rejected_total = REGISTRY.register(
+    Counter(
+        "ragflow_retries_rejected_total",
+        "Retries not made, because the retry budget was exhausted or the circuit was open.",
+        ["function", "reason"],
+    )
+)
+redis_command_duration = REGISTRY.register(
+    Histogram(
+        "ragflow_redis_command_duration_seconds",
+        "Latency of Redis commands and pipelines.",
+        ["command"],
+    )
+)
+embedding_batch_size = REGISTRY.register(
+    Histogram(
+        "ragflow_embedding_batch_size",
+        "Number of texts sent per embeddings request.",
+        ["source"],
+        buckets=SIZE_BUCKETS,
+    )
+)
+cache_lookups_total = REGISTRY.register(
+    Counter(
+        "ragflow_cache_lookups_total",
+        "Cache lookups by cache and result (hit or miss).",
+        ["cache", "result"],
+    )
+)
@@ -0,0 +1,103 @@
+import logging
+import threading
+import time
+from random import random
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to `capacity` tokens and refills continuously
+    at `refill_rate` tokens per second. Not thread-safe on its own, RateLimiter
+    guards it with a lock.
+    """
+
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity: float = capacity
+        self.refill_rate: float = refill_rate
+        self.tokens: float = capacity
+        self.updated_at: float = time.monotonic()
+
+    def refill(self, now: float):
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if they already are)."""
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.refill_rate)
+
+    def consume(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter for an API with requests-per-minute and tokens-per-minute
+    quotas, shared by all workers that call the same endpoint.
+
+    acquire() blocks until both buckets can pay for the request. When the API
+    still answers 429, backoff() pauses every worker, doubling the pause on each
+    consecutive 429 until record_success() is called, and never pausing less
+    than the Retry-After the server sent.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        base_backoff_in_seconds: float = 1.0,
+        max_backoff_in_seconds: float = 60.0,
+    ):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self.base_backoff_in_seconds: float = base_backoff_in_seconds
+        self.max_backoff_in_seconds: float = max_backoff_in_seconds
+        self._paused_until: float = 0.0
+        self._consecutive_rate_limits: int = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 1):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self.requests.refill(now)
+                    self.tokens.refill(now)
+                    wait = max(
+                        self.requests.wait_time(1), self.tokens.wait_time(tokens)
+                    )
+                    if wait == 0:
+                        self.requests.consume(1)
+                        self.tokens.consume(tokens)
+                        return
+            time.sleep(wait)
+
+    def backoff(self, retry_after: Optional[float] = None) -> float:
+        """
+        Pause all callers after a 429 (or a transient server or connection
+        error) and return the pause in seconds. The pause is at least
+        `retry_after`, the wait the server asked for.
+        """
+        with self._lock:
+            delay = min(
+                self.max_backoff_in_seconds,
+                self.base_backoff_in_seconds * 2**self._consecutive_rate_limits,
+            )
+            # jitter so the paused workers do not all retry in the same instant
+            delay = delay * (0.5 + random() / 2)
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            self._consecutive_rate_limits += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        logger.warning("Backing off, pausing requests for %.2f seconds", delay)
+        return delay
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive_rate_limits = 0
@@ -0,0 +1,43 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into a single execution.
+
+    The first caller for a key starts the call; callers arriving while it is
+    in flight await the same task and get the same result or exception. The
+    key is released as soon as the call finishes, so nothing is cached: a
+    call made after completion runs again.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.calls: int = 0
+        self.shared_calls: int = 0
+
+    async def do(
+        self, key: str, function: Callable[..., Awaitable[Any]], *args, **kwargs
+    ) -> Any:
+        task = self._in_flight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(function(*args, **kwargs))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._release(key, task))
+        else:
+            self.shared_calls += 1
+        # shield: one caller being cancelled must not cancel the shared call
+        return await asyncio.shield(task)
+
+    def _release(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "shared_calls": self.shared_calls,
+            "in_flight": len(self._in_flight),
+        }
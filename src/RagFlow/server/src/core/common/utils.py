@@ -2,6 +2,17 @@ import json
 from enum import Enum
 
 
+def estimate_tokens(text: str) -> int:
+    """
+    Upper-bound style token count for OpenAI models.
+
+    English averages ~4 bytes per token, code and non-latin scripts closer to 3,
+    so counting one token per 3 UTF-8 bytes errs on the high side and keeps
+    requests sized with it under the API limits.
+    """
+    return len(text.encode("utf-8")) // 3 + 1
+
+
 def filter_content(contexts: list, option: str):
     """Filter contexts based on the option selected by the llm."""
     for i, context in enumerate(contexts):
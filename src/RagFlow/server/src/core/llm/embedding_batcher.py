@@ -0,0 +1,85 @@
+import asyncio
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+
+from core.common.metrics import embedding_batch_size
+
+
+class EmbeddingMicroBatcher:
+    """
+    Merge embedding requests from concurrent callers into one API call.
+
+    embed() queues a text and waits. The queue is flushed as a single
+    `embed_batch` call when it holds `max_batch_size` texts, or
+    `max_wait_ms` after the first text was queued, whichever comes first;
+    each caller then gets back the vector of its own text. Identical texts in
+    a batch are only sent once.
+    """
+
+    def __init__(
+        self,
+        embed_batch: Callable[[List[str]], Awaitable[List[list]]],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5,
+    ):
+        self.embed_batch = embed_batch
+        self.max_batch_size: int = max_batch_size
+        self.max_wait_in_seconds: float = max_wait_ms / 1000
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # the loop only keeps weak references to tasks, hold the in-flight sends
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches: int = 0
+        self.items: int = 0
+
+    async def embed(self, text: str) -> list:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait_in_seconds, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future]]):
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        self.batches += 1
+        self.items += len(batch)
+        embedding_batch_size.observe(len(texts), source="server")
+        try:
+            vectors = await self.embed_batch(texts)
+            if len(vectors) != len(texts):
+                raise ValueError(
+                    f"Expected {len(texts)} embeddings, got {len(vectors)}"
+                )
+            vector_by_text = dict(zip(texts, vectors))
+            for text, future in batch:
+                # a caller may have been cancelled while waiting
+                if not future.done():
+                    future.set_result(vector_by_text[text])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            # cancelled (or interrupted): never leave a caller waiting
+            for _, future in batch:
+                if not future.done():
+                    future.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "average_batch_size": self.items / self.batches if self.batches else 0.0,
+        }
@@ -1,26 +1,198 @@
+import asyncio
+import inspect
 import os
-from typing import List
+import time
+from typing import AsyncIterator, List, Optional
 
-from core.common.config import OPENAI_API_KEY, OPENAI_API_MODEL
-from core.llm.openapi_client import LLMClientInterface, OpenAPIClient
+from core.common import config
+from core.common.config import (
+    EMBEDDING_BATCH_ENABLED,
+    EMBEDDING_BATCH_MAX_SIZE,
+    EMBEDDING_BATCH_MAX_WAIT_MS,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_REDIS,
+    LLM_CACHE_TTL,
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL,
+)
+from core.common.conn import get_async_redis_instance
+from core.common.singleflight import SingleFlight
+from core.llm.embedding_batcher import EmbeddingMicroBatcher
+from core.llm.openapi_client import AsyncOpenAPIClient, LLMClientInterface
+from core.llm.response_cache import ResponseCache, make_request_key
+from core.llm.semantic_cache import SemanticCache
 
 
 class LLMService:
-    def __init__(self, llm_client: LLMClientInterface):
+    def __init__(
+        self,
+        llm_client: LLMClientInterface,
+        response_cache: Optional[ResponseCache] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        embedding_batcher: Optional[EmbeddingMicroBatcher] = None,
+    ):
         self.llm_client = llm_client
+        self.response_cache = response_cache
+        self.semantic_cache = semantic_cache
+        self.embedding_batcher = embedding_batcher
+        self.single_flight = SingleFlight()
 
-    def predict(self, user_prompt: str):
-        return self.llm_client.predict(
-            [
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": user_prompt},
-            ]
+    @staticmethod
+    async def _call(function, *args, **kwargs):
+        """Await async clients, run blocking clients in a worker thread."""
+        if inspect.iscoroutinefunction(function):
+            return await function(*args, **kwargs)
+        return await asyncio.to_thread(function, *args, **kwargs)
+
+    async def predict(
+        self, user_prompt: str, temperature: float = 0.7, max_tokens: int = 1000
+    ):
+        """
+        Answer a prompt, trying the exact-match cache first, then the semantic
+        cache, and calling the client only when both miss.
+
+        Everything after the exact-match lookup runs through single-flight:
+        concurrent calls for the same request share one semantic lookup and
+        one upstream call, and all get its result.
+        """
+        messages = [
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": user_prompt},
+        ]
+        model = getattr(self.llm_client, "model", "")
+        key = make_request_key(model, messages, temperature, max_tokens)
+
+        if self.response_cache is not None:
+            response = await self.response_cache.get(key)
+            if response is not None:
+                return response
+
+        return await self.single_flight.do(
+            key,
+            self._predict_uncached,
+            key,
+            model,
+            user_prompt,
+            messages,
+            temperature,
+            max_tokens,
+        )
+
+    async def _predict_uncached(
+        self,
+        key: str,
+        model: str,
+        user_prompt: str,
+        messages: List[dict],
+        temperature: float,
+        max_tokens: int,
+    ):
+        prompt_vector = None
+        if self.semantic_cache is not None:
+            lookup_started_at = time.perf_counter()
+            prompt_vector = (await self.get_embeddings(user_prompt))[0]
+            scope = f"{model}:{temperature}:{max_tokens}"
+            response = self.semantic_cache.lookup(
+                prompt_vector, scope, lookup_started_at
+            )
+            if response is not None:
+                return response
+
+        upstream_started_at = time.perf_counter()
+        response = await self._call(
+            self.llm_client.predict,
+            messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+
+        if self.response_cache is not None:
+            await self.response_cache.set(key, response)
+        if self.semantic_cache is not None:
+            self.semantic_cache.record_upstream_latency(
+                time.perf_counter() - upstream_started_at
+            )
+            self.semantic_cache.add(prompt_vector, scope, response)
+        return response
+
+    async def predict_stream(
+        self, user_prompt: str, temperature: float = 0.7, max_tokens: int = 1000
+    ) -> AsyncIterator[str]:
+        """
+        Stream the answer to a prompt as text deltas. Streams bypass the caches.
+        Closing this generator closes the upstream stream.
+        """
+        messages = [
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": user_prompt},
+        ]
+        stream = self.llm_client.predict_stream(
+            messages, temperature=temperature, max_tokens=max_tokens
         )
+        if inspect.isasyncgen(stream):
+            try:
+                async for token in stream:
+                    yield token
+            finally:
+                await stream.aclose()
+            return
+
+        # blocking client: pull each token from a worker thread
+        end = object()
+        try:
+            while (token := await asyncio.to_thread(next, stream, end)) is not end:
+                yield token
+        finally:
+            stream.close()
+
+    async def get_embeddings(self, input_text: str):
+        # single texts are merged with the concurrent ones into one request
+        if self.embedding_batcher is not None and isinstance(input_text, str):
+            return [await self.embedding_batcher.embed(input_text)]
+        return await self._call(self.llm_client.get_embeddings, input_text)
 
-    def get_embeddings(self, input_text: str):
-        return self.llm_client.get_embeddings(input_text)
+    async def _embed_batch(self, texts: List[str]) -> List[list]:
+        return await self._call(self.llm_client.get_embeddings, texts)
+
+    def cache_stats(self) -> dict:
+        stats = {}
+        for name, cache in (
+            ("response_cache", self.response_cache),
+            ("semantic_cache", self.semantic_cache),
+        ):
+            stats[name] = (
+                {"enabled": False}
+                if cache is None
+                else {"enabled": True, **cache.stats()}
+            )
+        stats["single_flight"] = self.single_flight.stats()
+        return stats
 
 
 def llm_service_factory() -> LLMService:
-    llm_client = OpenAPIClient(OPENAI_API_KEY, OPENAI_API_MODEL)
-    return LLMService(llm_client)
+    llm_client = AsyncOpenAPIClient(config.OPENAI_API_KEY, config.OPENAI_API_MODEL)
+    response_cache = None
+    if LLM_CACHE_ENABLED:
+        response_cache = ResponseCache(
+            max_entries=LLM_CACHE_MAX_ENTRIES,
+            ttl_in_seconds=LLM_CACHE_TTL,
+            redis_client=get_async_redis_instance() if LLM_CACHE_REDIS else None,
+        )
+    semantic_cache = None
+    if SEMANTIC_CACHE_ENABLED:
+        semantic_cache = SemanticCache(
+            similarity_threshold=SEMANTIC_CACHE_THRESHOLD,
+            max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+            ttl_in_seconds=SEMANTIC_CACHE_TTL,
+        )
+    llm_service = LLMService(llm_client, response_cache, semantic_cache)
+    if EMBEDDING_BATCH_ENABLED:
+        llm_service.embedding_batcher = EmbeddingMicroBatcher(
+            llm_service._embed_batch,
+            max_batch_size=EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=EMBEDDING_BATCH_MAX_WAIT_MS,
+        )
+    return llm_service
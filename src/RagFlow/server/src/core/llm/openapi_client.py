@@ -1,10 +1,60 @@
-from typing import List
+import json
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Iterator, List, Mapping, Optional, Tuple
 
-import requests
+import httpx
 
-from ..common.config import OPENAI_BACKOFF, OPENAI_MAX_RETRIES
-from ..common.http_retry import retry_with_exponential_backoff
-from .utils import OpenAIError, OpenAIRateLimitError
+from ..common.config import (
+    EMBEDDING_MODEL,
+    OPENAI_BACKOFF,
+    OPENAI_CIRCUIT_FAILURE_THRESHOLD,
+    OPENAI_CIRCUIT_RESET_TIMEOUT,
+    OPENAI_MAX_BACKOFF,
+    OPENAI_MAX_RETRIES,
+    OPENAI_RETRY_BUDGET_MIN_PER_SECOND,
+    OPENAI_RETRY_BUDGET_RATIO,
+)
+from ..common.conn import get_http_client
+from ..common.http_retry import (
+    CircuitBreaker,
+    RetryBudget,
+    retry_with_exponential_backoff,
+)
+from ..common.metrics import openai_request_duration
+from .utils import OpenAIConnectionError, OpenAIError, OpenAIRateLimitError
+
+# shared by every client in the process, so an outage is seen by all callers
+openai_retry_budget = RetryBudget(
+    ratio=OPENAI_RETRY_BUDGET_RATIO,
+    min_retries_per_second=OPENAI_RETRY_BUDGET_MIN_PER_SECOND,
+)
+openai_circuit_breaker = CircuitBreaker(
+    failure_threshold=OPENAI_CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout_in_seconds=OPENAI_CIRCUIT_RESET_TIMEOUT,
+)
+
+
+def is_retryable_openai_error(error: Exception) -> bool:
+    """
+    Rate limits, server errors and failures to get a response are worth
+    retrying; other client errors fail the same way every time.
+    """
+    status_code = getattr(error, "status_code", None)
+    return status_code is None or status_code == 429 or status_code >= 500
+
+
+openai_retry = retry_with_exponential_backoff(
+    backoff_in_seconds=OPENAI_BACKOFF,
+    max_retries=OPENAI_MAX_RETRIES,
+    errors=(OpenAIError,),
+    is_retryable=is_retryable_openai_error,
+    max_backoff_in_seconds=OPENAI_MAX_BACKOFF,
+    retry_budget=openai_retry_budget,
+    circuit_breaker=openai_circuit_breaker,
+)
 
 
 class LLMClientInterface:
@@ -24,22 +74,122 @@ class LLMClientInterface:
     def get_embeddings(self, input_text: str) -> List[list]:
         raise NotImplementedError
 
+    def predict_stream(self, messages: List[dict], max_tokens=1000, temperature=0.1):
+        raise NotImplementedError
+
+
+def parse_retry_after(headers: Optional[Mapping]) -> Optional[float]:
+    """
+    Seconds to wait from the `retry-after-ms` or `Retry-After` headers. Retry-After
+    is either a number of seconds or an HTTP date.
+    """
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def raise_for_openai_error(
+    status_code: int, text: str, headers: Optional[Mapping] = None
+):
+    """Raise the OpenAIError matching a failed response."""
+    if status_code == 429:
+        # rate limit error
+        raise OpenAIRateLimitError(text, retry_after=parse_retry_after(headers))
+    # other error
+    raise OpenAIError(text, status_code=status_code)
+
+
+@contextmanager
+def raise_transport_errors(errors: tuple):
+    """Re-raise the http client's connection and timeout errors as OpenAIConnectionError."""
+    try:
+        yield
+    except errors as e:
+        raise OpenAIConnectionError(f"{e.__class__.__name__}: {e}") from e
+
+
+@contextmanager
+def observe_openai_call(endpoint: str):
+    """
+    Record the latency and status of one OpenAI call. The block sets
+    call["status"] from the response, "error" is kept if it raises first.
+    """
+    call = {"status": "error"}
+    started_at = time.perf_counter()
+    try:
+        yield call
+    finally:
+        openai_request_duration.observe(
+            time.perf_counter() - started_at, endpoint=endpoint, status=call["status"]
+        )
+
+
+def parse_stream_line(line: str) -> Tuple[bool, str]:
+    """
+    Parse one server-sent event line of a streamed chat completion.
+    Returns (done, content): done is True on the final `data: [DONE]` line and
+    content is the text delta of the chunk ("" for keep-alives and role chunks).
+    """
+    if not line.startswith("data:"):
+        return False, ""
+    payload = line[len("data:") :].strip()
+    if payload == "[DONE]":
+        return True, ""
+    choices = json.loads(payload).get("choices") or []
+    if not choices:
+        return False, ""
+    return False, choices[0].get("delta", {}).get("content") or ""
+
 
 class OpenAPIClient(LLMClientInterface):
-    def __init__(self, api_key: str, model: str = "gpt-4o-mini"):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-4o-mini",
+        embedding_model: str = EMBEDDING_MODEL,
+    ):
         self.base_url: str = "https://api.openai.com/v1"
         self.api_key: str = api_key
         self.model: str = model
+        self.embedding_model: str = embedding_model
         self.headers: dict = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         }
+        # only the blocking client needs requests, the server never imports it
+        import requests
+
+        # a session reuses the TCP/TLS connection between calls, but is not
+        # thread-safe: each thread calling the client gets its own
+        self._new_session = requests.Session
+        self._local = threading.local()
+        self.transport_errors: tuple = (requests.ConnectionError, requests.Timeout)
 
-    @retry_with_exponential_backoff(
-        backoff_in_seconds=OPENAI_BACKOFF,
-        max_retries=OPENAI_MAX_RETRIES,
-        errors=(OpenAIRateLimitError, OpenAIError),
-    )
+    @property
+    def session(self):
+        """The calling thread's session, created on its first call."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._new_session()
+        return session
+
+    @openai_retry
     def predict(
         self, messages: list[dict], temperature: float = 0.7, max_tokens: int = 1000
     ) -> str:
@@ -55,24 +205,66 @@ class OpenAPIClient(LLMClientInterface):
         }
 
         endpoint = "/chat/completions"
-        response = requests.post(
-            self.base_url + endpoint, headers=self.headers, json=data, timeout=60
-        )
+        with (
+            observe_openai_call(endpoint) as call,
+            raise_transport_errors(self.transport_errors),
+        ):
+            response = self.session.post(
+                self.base_url + endpoint, headers=self.headers, json=data, timeout=60
+            )
+            call["status"] = response.status_code
 
         # check if the response is not ok
         if not response.ok:
-            openai_error: OpenAIError
-            if response.status_code == 429:
-                # rate limit error
-                openai_error = OpenAIRateLimitError(response.text)
-            else:
-                # other error
-                openai_error = OpenAIError(response.text)
-
-            raise openai_error
+            raise_for_openai_error(
+                response.status_code, response.text, response.headers
+            )
 
         return response.json()
 
+    def predict_stream(
+        self, messages: list[dict], temperature: float = 0.7, max_tokens: int = 1000
+    ) -> Iterator[str]:
+        """
+        Stream the next message in the conversation, yielding text deltas as
+        they are generated. Closing the generator closes the connection,
+        which stops the generation upstream.
+        Ref: https://platform.openai.com/docs/api-reference/chat/streaming
+        """
+        data = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True,
+        }
+
+        endpoint = "/chat/completions"
+        started_at = time.perf_counter()
+        with self.session.post(
+            self.base_url + endpoint,
+            headers=self.headers,
+            json=data,
+            timeout=60,
+            stream=True,
+        ) as response:
+            # for streams the latency recorded is the time to the headers
+            openai_request_duration.observe(
+                time.perf_counter() - started_at,
+                endpoint=endpoint + ":stream",
+                status=response.status_code,
+            )
+            if not response.ok:
+                raise_for_openai_error(
+                    response.status_code, response.text, response.headers
+                )
+            for line in response.iter_lines(decode_unicode=True):
+                done, content = parse_stream_line(line or "")
+                if done:
+                    break
+                if content:
+                    yield content
+
     def get_embeddings(self, input_param: List[str]) -> list[list]:
         """
         Get the embedding of a text.
@@ -80,14 +272,149 @@ class OpenAPIClient(LLMClientInterface):
         """
         data = {
             "input": input_param,
-            "model": "text-embedding-ada-002",
+            "model": self.embedding_model,
         }
         endpoint = "/embeddings"
-        response = requests.post(
-            self.base_url + endpoint, headers=self.headers, json=data
-        )
+        with (
+            observe_openai_call(endpoint) as call,
+            raise_transport_errors(self.transport_errors),
+        ):
+            response = self.session.post(
+                self.base_url + endpoint, headers=self.headers, json=data
+            )
+            call["status"] = response.status_code
         if not response.ok:
-            raise Exception(f"Failed to get embedding: {response.json()}")
+            raise_for_openai_error(
+                response.status_code,
+                f"Failed to get embedding: {response.text}",
+                response.headers,
+            )
+
+        # response.json()["data"] is a list of dicts, each dict has a "embedding" key
+        return [result["embedding"] for result in response.json()["data"]]
+
+
+class AsyncOpenAPIClient(LLMClientInterface):
+    """
+    Non-blocking OpenAPIClient for the FastAPI server.
+
+    predict() and get_embeddings() are coroutines. All instances send their
+    requests through the shared, pooled httpx.AsyncClient from
+    core.common.conn, so connections are kept alive and reused across calls
+    instead of opening a new TLS connection per request.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-4o-mini",
+        embedding_model: str = EMBEDDING_MODEL,
+    ):
+        self.base_url: str = "https://api.openai.com/v1"
+        self.api_key: str = api_key
+        self.model: str = model
+        self.embedding_model: str = embedding_model
+        self.headers: dict = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    @openai_retry
+    async def predict(
+        self, messages: list[dict], temperature: float = 0.7, max_tokens: int = 1000
+    ) -> dict:
+        """
+        Predict the next message in the conversation.
+        Ref: https://platform.openai.com/docs/api-reference/chat/create
+        """
+        data = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+
+        endpoint = "/chat/completions"
+        with (
+            observe_openai_call(endpoint) as call,
+            raise_transport_errors((httpx.TransportError,)),
+        ):
+            response = await get_http_client().post(
+                self.base_url + endpoint, headers=self.headers, json=data
+            )
+            call["status"] = response.status_code
+        if not response.is_success:
+            raise_for_openai_error(
+                response.status_code, response.text, response.headers
+            )
+
+        return response.json()
+
+    async def predict_stream(
+        self, messages: list[dict], temperature: float = 0.7, max_tokens: int = 1000
+    ) -> AsyncIterator[str]:
+        """
+        Stream the next message in the conversation, yielding text deltas as
+        they are generated. Closing the generator closes the connection,
+        which stops the generation upstream.
+        Ref: https://platform.openai.com/docs/api-reference/chat/streaming
+        """
+        data = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True,
+        }
+
+        endpoint = "/chat/completions"
+        started_at = time.perf_counter()
+        async with get_http_client().stream(
+            "POST", self.base_url + endpoint, headers=self.headers, json=data
+        ) as response:
+            # for streams the latency recorded is the time to the headers
+            openai_request_duration.observe(
+                time.perf_counter() - started_at,
+                endpoint=endpoint + ":stream",
+                status=response.status_code,
+            )
+            if not response.is_success:
+                await response.aread()
+                raise_for_openai_error(
+                    response.status_code, response.text, response.headers
+                )
+            async for line in response.aiter_lines():
+                done, content = parse_stream_line(line)
+                if done:
+                    break
+                if content:
+                    yield content
+
+    @openai_retry
+    async def get_embeddings(self, input_param: List[str]) -> list[list]:
+        """
+        Get the embedding of a text.
+        Ref: https://platform.openai.com/docs/api-reference/embeddings
+        """
+        data = {
+            "input": input_param,
+            "model": self.embedding_model,
+        }
+        endpoint = "/embeddings"
+        with (
+            observe_openai_call(endpoint) as call,
+            raise_transport_errors((httpx.TransportError,)),
+        ):
+            response = await get_http_client().post(
+                self.base_url + endpoint, headers=self.headers, json=data
+            )
+            call["status"] = response.status_code
+        if not response.is_success:
+            raise_for_openai_error(
+                response.status_code,
+                f"Failed to get embedding: {response.text}",
+                response.headers,
+            )
 
         # response.json()["data"] is a list of dicts, each dict has a "embedding" key
         return [result["embedding"] for result in response.json()["data"]]
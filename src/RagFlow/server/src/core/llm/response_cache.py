@@ -0,0 +1,131 @@
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+import redis
+import redis.asyncio
+
+from core.common.metrics import cache_lookups_total, redis_command_duration
+
+logger = logging.getLogger(__name__)
+
+
+def make_request_key(
+    model: str, messages: List[dict], temperature: float, max_tokens: int
+) -> str:
+    """Stable hash of everything that determines a chat completion."""
+    payload = json.dumps(
+        {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Exact-match cache of LLM responses with two tiers.
+
+    1. An in-process LRU of at most `max_entries` responses, each expiring
+       `ttl_in_seconds` after it was stored
+    2. An optional Redis tier shared by all the server workers; a hit there
+       is copied into the local LRU
+
+    Redis errors are logged and treated as misses, the cache never fails a call.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_in_seconds: float = 3600,
+        redis_client: Optional[redis.asyncio.Redis] = None,
+        key_prefix: str = "llm:response:",
+    ):
+        self.max_entries: int = max_entries
+        self.ttl_in_seconds: float = ttl_in_seconds
+        self.redis_client = redis_client
+        self.key_prefix: str = key_prefix
+        # key -> (expires_at, response), least recently used first
+        self._entries: OrderedDict = OrderedDict()
+        self.hits: int = 0
+        self.redis_hits: int = 0
+        self.misses: int = 0
+
+    def _get_local(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def _set_local(self, key: str, response: Any, ttl_in_seconds: float):
+        self._entries[key] = (time.monotonic() + ttl_in_seconds, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Any]:
+        response = self._get_local(key)
+        if response is not None:
+            self.hits += 1
+            cache_lookups_total.inc(cache="response", result="hit")
+            return response
+
+        if self.redis_client is not None:
+            try:
+                redis_key = self.key_prefix + key
+                # one round trip for the value and its remaining lifetime
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.get(redis_key).ttl(redis_key)
+                with redis_command_duration.time(command="GET"):
+                    value, ttl = await pipe.execute()
+            except redis.RedisError as e:
+                logger.warning("Response cache Redis get failed: %s", e)
+                value = None
+            if value is not None:
+                response = json.loads(value)
+                self._set_local(key, response, ttl if ttl > 0 else self.ttl_in_seconds)
+                self.hits += 1
+                self.redis_hits += 1
+                cache_lookups_total.inc(cache="response_redis", result="hit")
+                return response
+
+        self.misses += 1
+        cache_lookups_total.inc(cache="response", result="miss")
+        return None
+
+    async def set(self, key: str, response: Any):
+        self._set_local(key, response, self.ttl_in_seconds)
+        if self.redis_client is None:
+            return
+        try:
+            with redis_command_duration.time(command="SET"):
+                await self.redis_client.set(
+                    self.key_prefix + key,
+                    json.dumps(response),
+                    ex=int(self.ttl_in_seconds),
+                )
+        except redis.RedisError as e:
+            logger.warning("Response cache Redis set failed: %s", e)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+        }
@@ -0,0 +1,112 @@
+import time
+from typing import Any, List, Optional
+
+import numpy as np
+
+from core.common.metrics import cache_lookups_total
+
+
+class SemanticCache:
+    """
+    Cache of LLM responses looked up by meaning instead of exact text.
+
+    Prompts are stored as L2-normalized embeddings in a fixed-size matrix of
+    `max_entries` rows. A lookup returns the response of the most similar live
+    prompt if its cosine similarity reaches `similarity_threshold`. Entries
+    expire `ttl_in_seconds` after being stored; once the matrix is full the
+    oldest entry is overwritten.
+
+    Entries only match within the same `scope` (the model and generation
+    parameters), so a cached answer is never returned for different settings.
+
+    Metrics: `hits` is the number of upstream calls saved, and
+    `saved_latency_seconds` estimates the time saved as the average upstream
+    latency minus the time spent embedding and searching, for every hit.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.95,
+        max_entries: int = 1000,
+        ttl_in_seconds: float = 3600,
+    ):
+        self.similarity_threshold: float = similarity_threshold
+        self.max_entries: int = max_entries
+        self.ttl_in_seconds: float = ttl_in_seconds
+        self._vectors: Optional[np.ndarray] = None  # allocated on first add
+        self._expires_at = np.full(max_entries, -np.inf)
+        self._scopes = np.full(max_entries, -1, dtype=np.int64)
+        self._scope_ids: dict = {}
+        self._responses: List[Any] = [None] * max_entries
+        self._next_slot: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self.saved_latency_seconds: float = 0.0
+        self._upstream_latency_seconds: float = 0.0
+        self._upstream_calls: int = 0
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def lookup(
+        self, vector: List[float], scope: str, lookup_started_at: Optional[float] = None
+    ) -> Optional[Any]:
+        """
+        Return the cached response closest to `vector` within `scope`, if any.
+
+        `lookup_started_at` is the time.perf_counter() value taken before the
+        prompt was embedded, so the embedding cost is deducted from the savings.
+        """
+        started_at = lookup_started_at or time.perf_counter()
+        scope_id = self._scope_ids.get(scope)
+        if self._vectors is None or scope_id is None:
+            self.misses += 1
+            cache_lookups_total.inc(cache="semantic", result="miss")
+            return None
+
+        similarities = self._vectors @ self._normalize(vector)
+        live = (self._expires_at > time.monotonic()) & (self._scopes == scope_id)
+        similarities = np.where(live, similarities, -np.inf)
+        slot = int(np.argmax(similarities))
+        if similarities[slot] < self.similarity_threshold:
+            self.misses += 1
+            cache_lookups_total.inc(cache="semantic", result="miss")
+            return None
+
+        self.hits += 1
+        cache_lookups_total.inc(cache="semantic", result="hit")
+        if self._upstream_calls:
+            average_upstream = self._upstream_latency_seconds / self._upstream_calls
+            self.saved_latency_seconds += max(
+                0.0, average_upstream - (time.perf_counter() - started_at)
+            )
+        return self._responses[slot]
+
+    def add(self, vector: List[float], scope: str, response: Any):
+        vector = self._normalize(vector)
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+
+        slot = self._next_slot
+        self._next_slot = (self._next_slot + 1) % self.max_entries
+        self._vectors[slot] = vector
+        self._expires_at[slot] = time.monotonic() + self.ttl_in_seconds
+        self._scopes[slot] = self._scope_ids.setdefault(scope, len(self._scope_ids))
+        self._responses[slot] = response
+
+    def record_upstream_latency(self, seconds: float):
+        self._upstream_latency_seconds += seconds
+        self._upstream_calls += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "saved_calls": self.hits,
+            "saved_latency_seconds": self.saved_latency_seconds,
+            "size": int(np.sum(self._expires_at > time.monotonic())),
+        }
@@ -1,3 +1,6 @@
+from typing import Optional
+
+
 class OpenAIError(Exception):
     """
     Base exception class for OpenAI-related errors.
@@ -7,10 +10,14 @@ class OpenAIError(Exception):
 
     Attributes:
         message (str): Human-readable error description
+        status_code (int | None): HTTP status of the failed response, None
+            if no response was received
     """
 
-    def __init__(self, message: str):
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
         self.message = message
+        self.status_code = status_code
 
 
 class OpenAIRateLimitError(OpenAIError):
@@ -20,6 +27,19 @@ class OpenAIRateLimitError(OpenAIError):
     This specific error occurs when requests to OpenAI services
     exceed the allowed rate limits, indicating that the client
     should back off or reduce request frequency.
+
+    Attributes:
+        retry_after (float | None): Seconds the server asked us to wait
+            (Retry-After header), if it sent one
     """
 
-    pass
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message, status_code=429)
+        self.retry_after = retry_after
+
+
+class OpenAIConnectionError(OpenAIError):
+    """
+    Exception raised when no response was received from OpenAI: the
+    connection failed, was dropped or timed out.
+    """
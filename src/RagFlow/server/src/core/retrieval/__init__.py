@@ -0,0 +1,3 @@
+"""
+Retrieval package initialization
+"""
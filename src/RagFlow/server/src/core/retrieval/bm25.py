@@ -0,0 +1,198 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from .vector_search import tag_values
+
+BM25_INDEX_FILE = "bm25_index.json"
+
+# Words are runs of letters and digits; "-", "_" and "." inside a word keep it
+# whole so error codes and product names ("e-1042", "gpt-4o") stay searchable
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+_PART_PATTERN = re.compile(r"[-_.]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase word tokens of `text`. A compound word is returned along with
+    its parts, so "gpt-4o" matches queries for "gpt-4o" as well as "gpt".
+    """
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        parts = _PART_PATTERN.split(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an in-memory inverted index.
+
+    score(d, q) = sum over the query terms t of
+        idf(t) * tf(t, d) * (k1 + 1) / (tf(t, d) + k1 * (1 - b + b * |d| / avgdl))
+
+    The postings of each term are kept as two aligned numpy arrays (document
+    rows, term frequencies), so a query costs one vectorized update of the
+    score array per query term rather than a loop over the documents.
+    """
+
+    def __init__(
+        self,
+        chunk_ids: List[str],
+        item_ids: List[str],
+        titles: List[str],
+        tags: dict,
+        doc_lengths: List[int],
+        postings: dict,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.chunk_ids: List[str] = [str(chunk_id) for chunk_id in chunk_ids]
+        self.item_ids: List[str] = [str(item_id) for item_id in item_ids]
+        self.titles: List[str] = titles
+        self.k1: float = k1
+        self.b: float = b
+        self.doc_lengths: np.ndarray = np.asarray(doc_lengths, dtype=np.float32)
+        self.avg_doc_length: float = (
+            float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0.0
+        )
+        # term -> [[row, ...], [tf, ...]], the form saved to disk
+        self.postings: dict = postings
+        self._rows: dict = {
+            term: np.asarray(rows, dtype=np.int64)
+            for term, (rows, _) in postings.items()
+        }
+        self._tfs: dict = {
+            term: np.asarray(tfs, dtype=np.float32)
+            for term, (_, tfs) in postings.items()
+        }
+        n_docs = len(self.chunk_ids)
+        self._idf: dict = {
+            term: math.log(1 + (n_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+            for term, (rows, _) in postings.items()
+        }
+        # tag field -> per chunk list of values, aligned with chunk_ids
+        self.tags: dict = tags
+        # tag field -> tag value -> boolean row mask
+        self._tag_masks: dict = {}
+        for field, rows_values in tags.items():
+            masks = {}
+            for row, values in enumerate(rows_values):
+                for value in values:
+                    masks.setdefault(value, np.zeros(n_docs, dtype=bool))
+                    masks[value][row] = True
+            self._tag_masks[field] = masks
+
+    @classmethod
+    def build(cls, documents: Iterable[dict], **kwargs) -> "BM25Index":
+        """
+        Index chunks of the form
+        {"chunk_id", "item_id", "title", "text", "app", "article_type", "aliases"};
+        the title and the text are indexed together.
+        """
+        chunk_ids, item_ids, titles, doc_lengths = [], [], [], []
+        tags = {"app": [], "article_type": []}
+        postings: dict = {}
+        for row, document in enumerate(documents):
+            terms = tokenize(f"{document.get('title', '')} {document.get('text', '')}")
+            for term, tf in Counter(terms).items():
+                term_postings = postings.setdefault(term, [[], []])
+                term_postings[0].append(row)
+                term_postings[1].append(tf)
+            chunk_ids.append(str(document["chunk_id"]))
+            item_ids.append(str(document["item_id"]))
+            titles.append(document.get("title", ""))
+            doc_lengths.append(len(terms))
+            for field in tags:
+                tags[field].append(tag_values(document, field))
+        return cls(chunk_ids, item_ids, titles, tags, doc_lengths, postings, **kwargs)
+
+    def save(self, folder_path: str):
+        index_data = {
+            "k1": self.k1,
+            "b": self.b,
+            "chunk_ids": self.chunk_ids,
+            "item_ids": self.item_ids,
+            "titles": self.titles,
+            "tags": self.tags,
+            "doc_lengths": self.doc_lengths.astype(int).tolist(),
+            "postings": self.postings,
+        }
+        path = os.path.join(folder_path, BM25_INDEX_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index_data, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, folder_path: str) -> "BM25Index":
+        with open(os.path.join(folder_path, BM25_INDEX_FILE), "r") as f:
+            index_data = json.load(f)
+        return cls(
+            index_data["chunk_ids"],
+            index_data["item_ids"],
+            index_data["titles"],
+            index_data["tags"],
+            index_data["doc_lengths"],
+            index_data["postings"],
+            k1=index_data["k1"],
+            b=index_data["b"],
+        )
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    def search(
+        self,
+        query_text: str,
+        top_k: int = 5,
+        app: Optional[str] = None,
+        article_type: Optional[str] = None,
+    ) -> List[dict]:
+        """
+        Return the top_k chunks for `query_text` as
+        {"chunk_id", "item_id", "score", "title"} dicts, best match first.
+        Chunks that share no term with the query are never returned.
+        """
+        scores = np.zeros(len(self.chunk_ids), dtype=np.float32)
+        length_norm = self.k1 * (
+            1 - self.b + self.b * self.doc_lengths / max(self.avg_doc_length, 1e-9)
+        )
+        for term in set(tokenize(query_text)):
+            rows = self._rows.get(term)
+            if rows is None:
+                continue
+            tfs = self._tfs[term]
+            scores[rows] += (
+                self._idf[term] * tfs * (self.k1 + 1) / (tfs + length_norm[rows])
+            )
+
+        for field, value in (("app", app), ("article_type", article_type)):
+            if value:
+                mask = self._tag_masks[field].get(value)
+                if mask is None:
+                    return []
+                scores[~mask] = 0.0
+
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) == 0:
+            return []
+        k = min(top_k, len(matched))
+        top_rows = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top_rows = top_rows[np.argsort(-scores[top_rows])]
+        return [
+            {
+                "chunk_id": self.chunk_ids[row],
+                "item_id": self.item_ids[row],
+                "score": float(scores[row]),
+                "title": self.titles[row],
+            }
+            for row in top_rows
+        ]
@@ -0,0 +1,156 @@
+import json
+import os
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+EMBEDDINGS_FILE = "embeddings.npy"
+EMBEDDING_IDS_FILE = "embedding_ids.npy"
+# the same rows scaled to unit length, what the cosine retriever maps
+NORMALIZED_EMBEDDINGS_FILE = "embeddings_normalized.npy"
+LEGACY_EMBEDDINGS_FILE = "embeddings.json"
+
+
+def _atomic_save(path: str, array: np.ndarray):
+    """Write a .npy file next to its destination and swap it in, so readers that
+    have the old file memory-mapped are never exposed to a half written file."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale every row to unit L2 norm, all-zero rows are left as they are."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return (matrix / np.maximum(norms, 1e-12)).astype(np.float32, copy=False)
+
+
+def save_embedding_store(
+    folder_path: str, item_ids: Iterable, vectors: Iterable[List[float]]
+):
+    """
+    Save embeddings as a contiguous float32 matrix plus a row-aligned id index.
+
+    Row i of embeddings.npy is the vector of the i-th id in embedding_ids.npy.
+    Both are plain .npy files, so they can be memory-mapped without parsing:
+    a 1536-dim vector costs 6 KB on disk instead of ~30 KB of JSON. A unit
+    length copy of the matrix is saved as well, see save_normalized_embeddings.
+
+    Args:
+        folder_path (str): Directory the two files are written to
+        item_ids (Iterable): Document ids, stored as strings
+        vectors (Iterable[List[float]]): Embedding vectors in the same order as item_ids
+    """
+    ids = np.asarray([str(item_id) for item_id in item_ids])
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim != 2 or matrix.shape[0] != len(ids):
+        raise ValueError(
+            f"Expected one vector per id, got {matrix.shape} for {len(ids)} ids"
+        )
+
+    os.makedirs(folder_path, exist_ok=True)
+    _atomic_save(os.path.join(folder_path, EMBEDDINGS_FILE), matrix)
+    _atomic_save(os.path.join(folder_path, EMBEDDING_IDS_FILE), ids)
+    _atomic_save(
+        os.path.join(folder_path, NORMALIZED_EMBEDDINGS_FILE), normalize_rows(matrix)
+    )
+
+
+def save_normalized_embeddings(folder_path: str, chunk_size: int = 65536) -> bool:
+    """
+    Write embeddings_normalized.npy from embeddings.npy unless it is up to date.
+
+    Cosine search needs unit rows. Normalizing at load time would give every
+    server process a private copy of the matrix, normalizing once on disk lets
+    all of them memory-map the same read-only pages. Rows are processed
+    `chunk_size` at a time, so the memory used does not grow with the store.
+
+    Returns:
+        bool: True if the file was (re)written, False if it was already current
+    """
+    source_path = os.path.join(folder_path, EMBEDDINGS_FILE)
+    target_path = os.path.join(folder_path, NORMALIZED_EMBEDDINGS_FILE)
+    if os.path.exists(target_path) and os.path.getmtime(
+        target_path
+    ) >= os.path.getmtime(source_path):
+        return False
+
+    source = np.load(source_path, mmap_mode="r")
+    tmp_path = target_path + ".tmp"
+    target = np.lib.format.open_memmap(
+        tmp_path, mode="w+", dtype=np.float32, shape=source.shape
+    )
+    for start in range(0, source.shape[0], chunk_size):
+        target[start : start + chunk_size] = normalize_rows(
+            np.asarray(source[start : start + chunk_size], dtype=np.float32)
+        )
+    target.flush()
+    del target
+    os.replace(tmp_path, target_path)
+    return True
+
+
+def embedding_store_exists(folder_path: str) -> bool:
+    return os.path.exists(
+        os.path.join(folder_path, EMBEDDINGS_FILE)
+    ) and os.path.exists(os.path.join(folder_path, EMBEDDING_IDS_FILE))
+
+
+class EmbeddingStore:
+    """
+    Read access to the embeddings saved by save_embedding_store.
+
+    With mmap=True (the default) the matrix is memory-mapped read-only: loading
+    is O(1), pages are read lazily, and every process that maps the same file
+    shares the same physical pages through the OS page cache.
+    """
+
+    def __init__(self, ids: np.ndarray, matrix: np.ndarray):
+        self.ids: np.ndarray = ids
+        self.matrix: np.ndarray = matrix
+        self._row_by_id: Optional[dict] = None
+
+    @classmethod
+    def load(
+        cls, folder_path: str, mmap: bool = True, normalized: bool = False
+    ) -> "EmbeddingStore":
+        """
+        Args:
+            normalized (bool): Load the unit length rows of
+                embeddings_normalized.npy instead of the raw embeddings
+        """
+        mmap_mode = "r" if mmap else None
+        matrix_file = NORMALIZED_EMBEDDINGS_FILE if normalized else EMBEDDINGS_FILE
+        matrix = np.load(os.path.join(folder_path, matrix_file), mmap_mode=mmap_mode)
+        ids = np.load(
+            os.path.join(folder_path, EMBEDDING_IDS_FILE), mmap_mode=mmap_mode
+        )
+        return cls(ids, matrix)
+
+    @classmethod
+    def from_legacy_json(cls, folder_path: str) -> "EmbeddingStore":
+        """Load the old embeddings.json format ([{"item_id", "embedding"}, ...])."""
+        with open(os.path.join(folder_path, LEGACY_EMBEDDINGS_FILE), "r") as f:
+            embeddings_data = json.load(f)
+        ids = np.asarray([str(item["item_id"]) for item in embeddings_data])
+        matrix = np.asarray(
+            [item["embedding"] for item in embeddings_data], dtype=np.float32
+        )
+        return cls(ids, matrix)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+    def row_of(self, item_id) -> int:
+        # the id -> row map is only built on the first lookup
+        if self._row_by_id is None:
+            self._row_by_id = {str(id_): row for row, id_ in enumerate(self.ids)}
+        return self._row_by_id[str(item_id)]
+
+    def get(self, item_id) -> np.ndarray:
+        return self.matrix[self.row_of(item_id)]
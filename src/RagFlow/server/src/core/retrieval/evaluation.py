@@ -0,0 +1,64 @@
+import time
+from typing import List
+
+import numpy as np
+
+from .embedding_store import normalize_rows
+from .numpy_search import NumpyVectorSearch
+
+
+def sample_queries(
+    matrix: np.ndarray, sample_size: int = 100, noise: float = 0.5, seed: int = 0
+) -> np.ndarray:
+    """
+    Stand-in queries for offline evaluation: random rows of the (normalized)
+    corpus matrix plus gaussian noise of expected norm `noise`, so the nearest
+    neighbours are not trivially the sampled rows themselves.
+    """
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(matrix.shape[0], size=min(sample_size, matrix.shape[0]))
+    vectors = np.asarray(matrix[np.sort(rows)], dtype=np.float32)
+    vectors += rng.normal(
+        scale=noise / np.sqrt(matrix.shape[1]), size=vectors.shape
+    ).astype(np.float32)
+    return normalize_rows(vectors)
+
+
+def recall_at_k(
+    reference: NumpyVectorSearch,
+    candidate: NumpyVectorSearch,
+    queries: np.ndarray,
+    top_k: int = 10,
+) -> float:
+    """Fraction of the exact top_k chunks of `reference` also found by `candidate`."""
+    expected = reference.search_batch(queries, top_k)
+    found = candidate.search_batch(queries, top_k)
+    matched = sum(
+        len({hit["chunk_id"] for hit in exact} & {hit["chunk_id"] for hit in approx})
+        for exact, approx in zip(expected, found)
+    )
+    total = sum(len(exact) for exact in expected)
+    return matched / total if total else 1.0
+
+
+def mean_latency_ms(
+    search: NumpyVectorSearch, queries: np.ndarray, top_k: int = 10
+) -> float:
+    """Mean single-query search_batch latency, in milliseconds."""
+    started_at = time.perf_counter()
+    for query in queries:
+        search.search_batch(query, top_k)
+    return (time.perf_counter() - started_at) * 1000 / max(len(queries), 1)
+
+
+def format_report(title: str, rows: List[dict]) -> str:
+    """Render report rows (dicts with the same keys) as an aligned text table."""
+    columns = list(rows[0])
+    cells = [[str(row[column]) for column in columns] for row in rows]
+    widths = [
+        max(len(column), *(len(line[i]) for line in cells))
+        for i, column in enumerate(columns)
+    ]
+    lines = [title, "  ".join(c.ljust(w) for c, w in zip(columns, widths))]
+    lines += ["  ".join(c.ljust(w) for c, w in zip(line, widths)) for line in cells]
+    return "\n".join(lines)
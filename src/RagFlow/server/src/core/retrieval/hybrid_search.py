@@ -0,0 +1,75 @@
+import asyncio
+from typing import List, Optional
+
+from .bm25 import BM25Index
+from .vector_search import VectorSearchInterface
+
+
+def reciprocal_rank_fusion(rankings: List[List[dict]], k: int = 60) -> List[dict]:
+    """
+    Merge ranked hit lists with reciprocal rank fusion.
+
+    A chunk's rrf_score is sum(1 / (k + rank)) over the lists it appears in
+    (rank starting at 1). Only ranks are used, so the cosine and BM25 scores,
+    which are on different scales, never need to be calibrated against each
+    other. A fused hit keeps the other fields of its first occurrence, the
+    earlier rankings win; hits are sorted by rrf_score.
+    """
+    fused: dict = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            entry = fused.setdefault(hit["chunk_id"], {**hit, "rrf_score": 0.0})
+            entry["rrf_score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda hit: hit["rrf_score"], reverse=True)
+
+
+class HybridSearch(VectorSearchInterface):
+    """
+    Vector search plus in-process BM25, merged with reciprocal rank fusion.
+
+    Both retrievers are queried concurrently for `candidates` hits each: the
+    vector backend as usual, BM25 in a worker thread since it is CPU bound.
+    BM25 lives in memory, so no network hop is added. Without a query_text
+    the vector hits are returned unchanged.
+
+    Fused hits are ordered by their rrf_score and keep the cosine similarity
+    of the vector backend in `score`; it is None for the chunks that only
+    BM25 found, BM25 scores are not comparable to it.
+    """
+
+    def __init__(
+        self,
+        vector_search: VectorSearchInterface,
+        bm25_index: BM25Index,
+        rrf_k: int = 60,
+        candidates: int = 20,
+    ):
+        self.vector_search: VectorSearchInterface = vector_search
+        self.bm25_index: BM25Index = bm25_index
+        self.rrf_k: int = rrf_k
+        self.candidates: int = candidates
+
+    async def search(
+        self,
+        query_vector: List[float],
+        top_k: int = 5,
+        app: Optional[str] = None,
+        article_type: Optional[str] = None,
+        query_text: Optional[str] = None,
+    ) -> List[dict]:
+        if not query_text:
+            return await self.vector_search.search(
+                query_vector, top_k=top_k, app=app, article_type=article_type
+            )
+
+        candidates = max(top_k, self.candidates)
+        vector_hits, lexical_hits = await asyncio.gather(
+            self.vector_search.search(
+                query_vector, top_k=candidates, app=app, article_type=article_type
+            ),
+            asyncio.to_thread(
+                self.bm25_index.search, query_text, candidates, app, article_type
+            ),
+        )
+        lexical_hits = [{**hit, "score": None} for hit in lexical_hits]
+        return reciprocal_rank_fusion([vector_hits, lexical_hits], k=self.rrf_k)[:top_k]
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .embedding_store import EmbeddingStore, normalize_rows, save_normalized_embeddings
+from .vector_search import VectorSearchInterface, tag_values
+
+METADATA_FILE = "metadata.json"
+
+
+def load_metadata(folder_path: str) -> List[dict]:
+    with open(os.path.join(folder_path, METADATA_FILE), "r") as f:
+        return json.load(f)
+
+
+def top_k_rows(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rows and scores of the k best scores of each row of `scores`, best first.
+    argpartition finds the unordered top k in O(n), then only those are sorted.
+    """
+    top_rows = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top_rows, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return (
+        np.take_along_axis(top_rows, order, axis=1),
+        np.take_along_axis(top_scores, order, axis=1),
+    )
+
+
+class NumpyVectorSearch(VectorSearchInterface):
+    """
+    In-process exact KNN over the embedding matrix, no Redis needed.
+
+    Rows are L2-normalized so a query is ranked by cosine similarity with a
+    single matrix-vector product; argpartition then selects the top_k in O(n)
+    before only those k rows are sorted. Several queries can be ranked at once
+    with search_batch (one matrix-matrix product).
+
+    Pass `normalized=True` for a store whose rows already have unit length:
+    the memory-mapped matrix and ids are then used as they are, so every
+    server worker shares the same pages instead of holding its own copy.
+    """
+
+    def __init__(
+        self, store: EmbeddingStore, metadata_data: List[dict], normalized: bool = False
+    ):
+        self.matrix: np.ndarray = (
+            store.matrix
+            if normalized
+            else normalize_rows(np.asarray(store.matrix, dtype=np.float32))
+        )
+        # chunk_ids, row-aligned with the matrix
+        self.ids: np.ndarray = store.ids
+
+        metadata_by_id = {
+            str(item["chunk_id"]): item["metadata"] for item in metadata_data
+        }
+        rows_metadata = [metadata_by_id.get(str(chunk_id), {}) for chunk_id in self.ids]
+        self.item_ids: List[str] = [
+            str(metadata.get("item_id", "")) for metadata in rows_metadata
+        ]
+        self.titles: List[str] = [
+            metadata.get("title", "") for metadata in rows_metadata
+        ]
+        # tag field -> tag value -> boolean row mask, used as pre-filters
+        self.tag_masks: dict = {}
+        for field in ("app", "article_type"):
+            masks = {}
+            for row, metadata in enumerate(rows_metadata):
+                for value in tag_values(metadata, field):
+                    masks.setdefault(value, np.zeros(len(rows_metadata), dtype=bool))
+                    masks[value][row] = True
+            self.tag_masks[field] = masks
+
+    @classmethod
+    def from_folder(cls, folder_path: str) -> "NumpyVectorSearch":
+        # a no-op when the data prep (or the launcher in prod) already wrote it
+        save_normalized_embeddings(folder_path)
+        store = EmbeddingStore.load(folder_path, normalized=True)
+        return cls(store, load_metadata(folder_path), normalized=True)
+
+    def _filter_mask(
+        self, app: Optional[str], article_type: Optional[str]
+    ) -> Optional[np.ndarray]:
+        mask = None
+        for field, value in (("app", app), ("article_type", article_type)):
+            if not value:
+                continue
+            field_mask = self.tag_masks[field].get(
+                value, np.zeros(len(self.ids), dtype=bool)
+            )
+            mask = field_mask if mask is None else mask & field_mask
+        return mask
+
+    def search_batch(
+        self,
+        query_vectors: np.ndarray,
+        top_k: int = 5,
+        app: Optional[str] = None,
+        article_type: Optional[str] = None,
+    ) -> List[List[dict]]:
+        """
+        Rank the documents for several queries at once.
+
+        Args:
+            query_vectors (np.ndarray): A (n_queries, dim) array of query embeddings
+
+        Returns:
+            List[List[dict]]: For each query, the top_k hits best match first
+        """
+        queries = self._prepare_queries(query_vectors)
+        scores = self._score(queries)
+
+        candidates = len(self.ids)
+        mask = self._filter_mask(app, article_type)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+            candidates = int(mask.sum())
+        k = min(top_k, candidates)
+        if k == 0:
+            return [[] for _ in range(len(queries))]
+
+        top_rows, top_scores = top_k_rows(
+            scores, min(self._candidate_count(k), candidates)
+        )
+        top_rows, top_scores = self._rerank(queries, top_rows, top_scores, k)
+
+        return [
+            [
+                {
+                    "chunk_id": str(self.ids[row]),
+                    "item_id": self.item_ids[row],
+                    "score": float(score),
+                    "title": self.titles[row],
+                }
+                for row, score in zip(rows, row_scores)
+            ]
+            for rows, row_scores in zip(top_rows, top_scores)
+        ]
+
+    # Steps of search_batch that the approximate retrievers override
+
+    def _prepare_queries(self, query_vectors: np.ndarray) -> np.ndarray:
+        return normalize_rows(
+            np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        )
+
+    def _score(self, queries: np.ndarray) -> np.ndarray:
+        return queries @ self.matrix.T
+
+    def _candidate_count(self, k: int) -> int:
+        return k
+
+    def _rerank(
+        self, queries: np.ndarray, rows: np.ndarray, scores: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        return rows, scores
+
+    async def search(
+        self,
+        query_vector: List[float],
+        top_k: int = 5,
+        app: Optional[str] = None,
+        article_type: Optional[str] = None,
+        query_text: Optional[str] = None,
+    ) -> List[dict]:
+        # numpy releases the GIL in the product, keep it off the event loop
+        results = await asyncio.to_thread(
+            self.search_batch, query_vector, top_k, app, article_type
+        )
+        return results[0]
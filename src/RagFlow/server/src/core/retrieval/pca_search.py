@@ -0,0 +1,258 @@
+import os
+from typing import List, Tuple
+
+import numpy as np
+
+from .embedding_store import (
+    NORMALIZED_EMBEDDINGS_FILE,
+    EmbeddingStore,
+    normalize_rows,
+    save_normalized_embeddings,
+)
+from .evaluation import mean_latency_ms, recall_at_k, sample_queries
+from .numpy_search import NumpyVectorSearch, load_metadata
+
+PCA_PROJECTION_FILE = "pca_projection.npz"
+PCA_EMBEDDINGS_FILE = "embeddings_pca.npy"
+# widths compared by pca_report, besides the configured one
+PCA_REPORT_DIMENSIONS = (64, 128, 256, 512)
+
+
+def fit_pca(
+    matrix: np.ndarray,
+    n_components: int,
+    sample_size: int = 50000,
+    seed: int = 0,
+    chunk_size: int = 4096,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fit a PCA projection from the covariance of the rows.
+
+    At most `sample_size` random rows are used, the principal directions of a
+    large corpus are stable well before all of it is seen. The rows are read
+    `chunk_size` at a time into the (dim, dim) covariance, whose eigenvectors
+    are the principal directions, so no copy of the sample is held.
+    `n_components` is capped by the number of rows and the dimension.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The (dim,) mean and the (dim, n_components)
+        projection, so a vector v is reduced with (v - mean) @ projection
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.arange(matrix.shape[0])
+    if len(rows) > sample_size:
+        rows = np.sort(rng.choice(rows, size=sample_size, replace=False))
+    dim = matrix.shape[1]
+    total = np.zeros(dim)
+    gram = np.zeros((dim, dim))
+    for start in range(0, len(rows), chunk_size):
+        chunk = np.asarray(matrix[rows[start : start + chunk_size]], dtype=np.float64)
+        total += chunk.sum(axis=0)
+        gram += chunk.T @ chunk
+    mean = total / len(rows)
+    covariance = gram / len(rows) - np.outer(mean, mean)
+    # eigh sorts the eigenvalues in ascending order, the directions are reversed
+    _, eigenvectors = np.linalg.eigh(covariance)
+    n_components = min(n_components, len(rows), dim)
+    projection = eigenvectors[:, ::-1][:, :n_components]
+    return mean.astype(np.float32), np.ascontiguousarray(projection, dtype=np.float32)
+
+
+def project(vectors: np.ndarray, mean: np.ndarray, projection: np.ndarray):
+    """Reduce vectors with a fitted projection, back to unit length for cosine."""
+    return normalize_rows((np.asarray(vectors, dtype=np.float32) - mean) @ projection)
+
+
+def pca_embeddings_current(folder_path: str, n_components: int) -> bool:
+    """
+    True if pca_projection.npz and embeddings_pca.npy exist, are newer than
+    embeddings_normalized.npy and were fitted for `n_components`.
+    """
+    source_path = os.path.join(folder_path, NORMALIZED_EMBEDDINGS_FILE)
+    projection_path = os.path.join(folder_path, PCA_PROJECTION_FILE)
+    if not os.path.exists(source_path) or not all(
+        os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(source_path)
+        for path in (projection_path, os.path.join(folder_path, PCA_EMBEDDINGS_FILE))
+    ):
+        return False
+    with np.load(projection_path) as saved:
+        return saved["n_components"] == n_components
+
+
+def save_pca_embeddings(
+    folder_path: str, n_components: int, chunk_size: int = 65536
+) -> bool:
+    """
+    Fit the projection on the normalized embeddings and store the reduced rows.
+
+    Writes pca_projection.npz (the mean and the projection, needed to reduce
+    queries) and embeddings_pca.npy, unless both are newer than
+    embeddings_normalized.npy and were fitted for the same `n_components`.
+
+    Returns:
+        bool: True if the files were (re)written, False if already current
+    """
+    save_normalized_embeddings(folder_path)
+    if pca_embeddings_current(folder_path, n_components):
+        return False
+
+    source_path = os.path.join(folder_path, NORMALIZED_EMBEDDINGS_FILE)
+    projection_path = os.path.join(folder_path, PCA_PROJECTION_FILE)
+    reduced_path = os.path.join(folder_path, PCA_EMBEDDINGS_FILE)
+    source = np.load(source_path, mmap_mode="r")
+    mean, projection = fit_pca(source, n_components)
+    reduced = np.lib.format.open_memmap(
+        reduced_path + ".tmp",
+        mode="w+",
+        dtype=np.float32,
+        shape=(source.shape[0], projection.shape[1]),
+    )
+    for start in range(0, source.shape[0], chunk_size):
+        reduced[start : start + chunk_size] = project(
+            source[start : start + chunk_size], mean, projection
+        )
+    reduced.flush()
+    del reduced
+    with open(projection_path + ".tmp", "wb") as f:
+        # the requested size, the projection may be narrower on a small corpus
+        np.savez(f, mean=mean, projection=projection, n_components=n_components)
+    os.replace(projection_path + ".tmp", projection_path)
+    os.replace(reduced_path + ".tmp", reduced_path)
+    return True
+
+
+class PCAVectorSearch(NumpyVectorSearch):
+    """
+    Exact KNN in a PCA-reduced space.
+
+    The stored rows were projected on the top principal directions of the
+    corpus and re-normalized; queries go through the same saved projection, so
+    both the matrix and the per-query product shrink by dim / n_components.
+    The ranking is approximate with respect to the full vectors, see
+    pca_report for the recall.
+    """
+
+    def __init__(
+        self,
+        store: EmbeddingStore,
+        metadata_data: List[dict],
+        mean: np.ndarray,
+        projection: np.ndarray,
+    ):
+        super().__init__(store, metadata_data, normalized=True)
+        self.mean: np.ndarray = mean
+        self.projection: np.ndarray = projection
+
+    @classmethod
+    def from_folder(cls, folder_path: str, n_components: int) -> "PCAVectorSearch":
+        # read only: every server worker runs this, the files are written
+        # once beforehand by the data prep or the launcher
+        if not pca_embeddings_current(folder_path, n_components):
+            raise FileNotFoundError(
+                f"{PCA_PROJECTION_FILE} and {PCA_EMBEDDINGS_FILE} in {folder_path} are "
+                f"missing, older than {NORMALIZED_EMBEDDINGS_FILE} or not fitted for "
+                f"{n_components} components, build them with save_pca_embeddings "
+                "(run by prepare_data and server.py)"
+            )
+        store = EmbeddingStore(
+            EmbeddingStore.load(folder_path, normalized=True).ids,
+            np.load(os.path.join(folder_path, PCA_EMBEDDINGS_FILE), mmap_mode="r"),
+        )
+        with np.load(os.path.join(folder_path, PCA_PROJECTION_FILE)) as saved:
+            mean, projection = saved["mean"], saved["projection"]
+        return cls(store, load_metadata(folder_path), mean, projection)
+
+    def _prepare_queries(self, query_vectors: np.ndarray) -> np.ndarray:
+        return project(
+            super()._prepare_queries(query_vectors), self.mean, self.projection
+        )
+
+
+def pca_report(
+    folder_path: str,
+    dimensions: Tuple[int, ...] = PCA_REPORT_DIMENSIONS,
+    top_k: int = 10,
+    sample_size: int = 100,
+    corpus_sample_size: int = 20000,
+    chunk_size: int = 8192,
+) -> List[dict]:
+    """
+    Compare PCA-reduced retrievers with the exact full-dimension one.
+
+    Returns one row per reduced dimension (plus the full baseline) with the
+    recall@top_k against the exact results, the share of the variance kept,
+    the size of the whole matrix and the mean query latency. The memory used
+    does not grow with the store: recall and latency are measured on at most
+    `corpus_sample_size` random rows, and the variance is summed over the
+    whole matrix `chunk_size` rows at a time. A dimension that a small corpus
+    caps to an already reported width is skipped. The projections are fitted
+    in memory, the saved one is left as it was.
+    """
+    save_normalized_embeddings(folder_path)
+    store = EmbeddingStore.load(folder_path, normalized=True)
+    n_rows, dim = store.matrix.shape
+    rows = np.arange(n_rows)
+    if n_rows > corpus_sample_size:
+        rng = np.random.default_rng(0)
+        rows = np.sort(rng.choice(rows, size=corpus_sample_size, replace=False))
+    sample = EmbeddingStore(
+        store.ids[rows], np.asarray(store.matrix[rows], dtype=np.float32)
+    )
+    exact = NumpyVectorSearch(sample, [], normalized=True)
+    queries = sample_queries(exact.matrix, sample_size)
+    report = [
+        {
+            "dim": dim,
+            f"recall@{top_k}": 1.0,
+            "variance": 1.0,
+            "MB": round(n_rows * dim * 4 / 2**20, 2),
+            "ms/query": round(mean_latency_ms(exact, queries, top_k), 3),
+        }
+    ]
+    dimensions = [n_components for n_components in dimensions if n_components < dim]
+    if not dimensions:
+        return report
+
+    # the leading columns of the widest projection are the narrower ones
+    mean, projection = fit_pca(store.matrix, max(dimensions))
+    total_variance = 0.0
+    component_variance = np.zeros(projection.shape[1])
+    for start in range(0, n_rows, chunk_size):
+        centered = (
+            np.asarray(store.matrix[start : start + chunk_size], dtype=np.float32)
+            - mean
+        )
+        total_variance += float((centered**2).sum())
+        component_variance += ((centered @ projection) ** 2).sum(axis=0)
+
+    reported = set()
+    for n_components in dimensions:
+        width = min(n_components, projection.shape[1])
+        if width in reported:
+            continue
+        reported.add(width)
+        reduced_projection = projection[:, :width]
+        reduced = PCAVectorSearch(
+            EmbeddingStore(
+                sample.ids, project(sample.matrix, mean, reduced_projection)
+            ),
+            [],
+            mean,
+            reduced_projection,
+        )
+        report.append(
+            {
+                "dim": width,
+                f"recall@{top_k}": round(
+                    recall_at_k(exact, reduced, queries, top_k), 4
+                ),
+                "variance": round(
+                    float(component_variance[:width].sum())
+                    / max(total_variance, 1e-12),
+                    4,
+                ),
+                "MB": round(n_rows * width * 4 / 2**20, 2),
+                "ms/query": round(mean_latency_ms(reduced, queries, top_k), 3),
+            }
+        )
+    return report
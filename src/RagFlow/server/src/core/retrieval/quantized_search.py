@@ -0,0 +1,203 @@
+import os
+from typing import List, Tuple
+
+import numpy as np
+
+from .embedding_store import (
+    NORMALIZED_EMBEDDINGS_FILE,
+    EmbeddingStore,
+    save_normalized_embeddings,
+)
+from .evaluation import mean_latency_ms, recall_at_k, sample_queries
+from .numpy_search import NumpyVectorSearch, load_metadata
+
+INT8_CODES_FILE = "embeddings_int8.npy"
+INT8_SCALES_FILE = "embeddings_int8_scales.npy"
+
+
+def quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Scalar int8 quantization with one scale per vector.
+
+    Row i is stored as codes[i] = round(matrix[i] / scales[i]), with
+    scales[i] = max(|matrix[i]|) / 127, so every row uses the full int8 range.
+    codes[i] * scales[i] approximates the row with a per-component error of
+    at most scales[i] / 2.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scales = np.abs(matrix).max(axis=1) / 127
+    scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def quantized_embeddings_current(folder_path: str) -> bool:
+    """True if the int8 codes and scales exist and are newer than embeddings_normalized.npy."""
+    source_path = os.path.join(folder_path, NORMALIZED_EMBEDDINGS_FILE)
+    return os.path.exists(source_path) and all(
+        os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(source_path)
+        for path in (
+            os.path.join(folder_path, INT8_CODES_FILE),
+            os.path.join(folder_path, INT8_SCALES_FILE),
+        )
+    )
+
+
+def save_quantized_embeddings(folder_path: str, chunk_size: int = 65536) -> bool:
+    """
+    Write the int8 codes and scales of the normalized embeddings, unless they
+    are newer than embeddings_normalized.npy. Rows are quantized `chunk_size`
+    at a time so the memory used does not grow with the store.
+
+    Returns:
+        bool: True if the files were (re)written, False if already current
+    """
+    save_normalized_embeddings(folder_path)
+    if quantized_embeddings_current(folder_path):
+        return False
+
+    source_path = os.path.join(folder_path, NORMALIZED_EMBEDDINGS_FILE)
+    codes_path = os.path.join(folder_path, INT8_CODES_FILE)
+    scales_path = os.path.join(folder_path, INT8_SCALES_FILE)
+    source = np.load(source_path, mmap_mode="r")
+    codes = np.lib.format.open_memmap(
+        codes_path + ".tmp", mode="w+", dtype=np.int8, shape=source.shape
+    )
+    scales = np.empty(source.shape[0], dtype=np.float32)
+    for start in range(0, source.shape[0], chunk_size):
+        block_codes, block_scales = quantize_int8(source[start : start + chunk_size])
+        codes[start : start + chunk_size] = block_codes
+        scales[start : start + chunk_size] = block_scales
+    codes.flush()
+    del codes
+    with open(scales_path + ".tmp", "wb") as f:
+        np.save(f, scales)
+    os.replace(scales_path + ".tmp", scales_path)
+    os.replace(codes_path + ".tmp", codes_path)
+    return True
+
+
+class QuantizedVectorSearch(NumpyVectorSearch):
+    """
+    Approximate KNN over int8 codes with an exact float re-rank.
+
+    Candidates are ranked over the int8 codes, a quarter of the float32 matrix.
+    The codes are widened to float32 `block_size` rows at a time into one
+    small buffer that stays in the CPU cache, so a query reads a quarter of
+    the bytes of the exact scan and never allocates more than that buffer.
+    The best `rerank_factor * top_k` candidates are then scored exactly
+    against their float rows, read from the memory-mapped normalized matrix;
+    only those few pages are touched, the float matrix never has to be
+    resident. Recall is measured by quantization_report.
+    """
+
+    def __init__(
+        self,
+        store: EmbeddingStore,
+        metadata_data: List[dict],
+        codes: np.ndarray,
+        scales: np.ndarray,
+        rerank_factor: int = 4,
+        block_size: int = 128,
+    ):
+        super().__init__(store, metadata_data, normalized=True)
+        # a plain view of the mapped codes, slicing a np.memmap is slower
+        self.codes: np.ndarray = np.asarray(codes)
+        self.scales: np.ndarray = np.asarray(scales, dtype=np.float32)
+        self.rerank_factor: int = rerank_factor
+        self.block_size: int = block_size
+
+    @classmethod
+    def from_folder(
+        cls, folder_path: str, rerank_factor: int = 4
+    ) -> "QuantizedVectorSearch":
+        # read only: every server worker runs this, the files are written
+        # once beforehand by the data prep or the launcher
+        if not quantized_embeddings_current(folder_path):
+            raise FileNotFoundError(
+                f"{INT8_CODES_FILE} and {INT8_SCALES_FILE} in {folder_path} are "
+                f"missing or older than {NORMALIZED_EMBEDDINGS_FILE}, build them "
+                "with save_quantized_embeddings (run by prepare_data and server.py)"
+            )
+        return cls(
+            EmbeddingStore.load(folder_path, normalized=True),
+            load_metadata(folder_path),
+            np.load(os.path.join(folder_path, INT8_CODES_FILE), mmap_mode="r"),
+            np.load(os.path.join(folder_path, INT8_SCALES_FILE)),
+            rerank_factor=rerank_factor,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes scanned per query: the codes and their scales."""
+        return self.codes.nbytes + self.scales.nbytes
+
+    def _score(self, queries: np.ndarray) -> np.ndarray:
+        n_rows, dim = self.codes.shape
+        scores = np.empty((len(queries), n_rows), dtype=np.float32)
+        block = np.empty((min(self.block_size, n_rows), dim), dtype=np.float32)
+        for start in range(0, n_rows, self.block_size):
+            codes = self.codes[start : start + self.block_size]
+            rows = block[: len(codes)]
+            np.copyto(rows, codes, casting="unsafe")
+            np.matmul(queries, rows.T, out=scores[:, start : start + len(codes)])
+        scores *= self.scales
+        return scores
+
+    def _candidate_count(self, k: int) -> int:
+        return k * self.rerank_factor
+
+    def _rerank(
+        self, queries: np.ndarray, rows: np.ndarray, scores: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # exact cosine of every candidate, from its float row
+        exact_scores = np.einsum("qd,qcd->qc", queries, self.matrix[rows])
+        order = np.argsort(-exact_scores, axis=1)[:, :k]
+        return (
+            np.take_along_axis(rows, order, axis=1),
+            np.take_along_axis(exact_scores, order, axis=1),
+        )
+
+
+def quantization_report(
+    folder_path: str,
+    rerank_factors: Tuple[int, ...] = (1, 2, 4, 8),
+    top_k: int = 10,
+    sample_size: int = 100,
+) -> List[dict]:
+    """
+    Compare the int8 retriever with the exact float32 one on sampled queries.
+
+    Returns one row per re-rank factor (plus the float32 baseline) with the
+    recall@top_k against the exact results, the MB scanned per query, the
+    float32 rows read per query and the mean query latency. The float32
+    matrix stays memory-mapped for the int8 retrievers: only the re-ranked
+    rows are read from it, not counted in their MB.
+    """
+    exact = NumpyVectorSearch.from_folder(folder_path)
+    queries = sample_queries(exact.matrix, sample_size)
+    rows = [
+        {
+            "index": "float32",
+            f"recall@{top_k}": 1.0,
+            "MB scanned": round(exact.matrix.nbytes / 2**20, 2),
+            "float32 rows read": exact.matrix.shape[0],
+            "ms/query": round(mean_latency_ms(exact, queries, top_k), 3),
+        }
+    ]
+    for rerank_factor in rerank_factors:
+        quantized = QuantizedVectorSearch.from_folder(folder_path, rerank_factor)
+        rows.append(
+            {
+                "index": f"int8 rerank x{rerank_factor}",
+                f"recall@{top_k}": round(
+                    recall_at_k(exact, quantized, queries, top_k), 4
+                ),
+                "MB scanned": round(quantized.nbytes / 2**20, 2),
+                "float32 rows read": min(
+                    rerank_factor * top_k, quantized.matrix.shape[0]
+                ),
+                "ms/query": round(mean_latency_ms(quantized, queries, top_k), 3),
+            }
+        )
+    return rows
@@ -0,0 +1,186 @@
+import logging
+import os
+import re
+from typing import List, Optional
+
+import numpy as np
+from redis.commands.search.query import Query
+
+from ..common.config import (
+    DATA_LOCATION,
+    EMBEDDING_PCA_DIM,
+    EMBEDDING_QUANTIZATION,
+    HYBRID_CANDIDATES,
+    HYBRID_RRF_K,
+    HYBRID_SEARCH_ENABLED,
+    INDEX_NAME,
+    QUANTIZED_RERANK_FACTOR,
+    SEARCH_BACKEND,
+)
+from ..common.conn import get_async_redis_instance
+from ..common.metrics import redis_command_duration
+
+logger = logging.getLogger(__name__)
+
+# Characters that have a meaning in the RediSearch query syntax and must be
+# escaped inside a tag value, e.g. "app-store" -> "app\-store"
+_TAG_ESCAPE_PATTERN = re.compile(r"([,.<>{}\[\]\"':;!@#$%^&*()\-+=~|/\\ ])")
+
+
+class VectorSearchInterface:
+    """
+    Abstract interface for vector search backends.
+
+    Any concrete backend must implement search(), which returns the top_k
+    chunks closest to the query vector as a list of
+    {"chunk_id": str, "item_id": str, "score": float, "title": str} dicts,
+    best match first; item_id is the document the chunk comes from.
+    `app` and `article_type` restrict the candidates before ranking.
+    `query_text` is the raw query, used by backends that also match words;
+    pure vector backends ignore it.
+    """
+
+    async def search(
+        self,
+        query_vector: List[float],
+        top_k: int = 5,
+        app: Optional[str] = None,
+        article_type: Optional[str] = None,
+        query_text: Optional[str] = None,
+    ) -> List[dict]:
+        raise NotImplementedError
+
+
+def tag_values(metadata: dict, field: str) -> List[str]:
+    """
+    The values of a tag field a chunk matches in filters: its own and those of
+    the near-duplicate documents folded into it at ingest (metadata["aliases"]).
+    """
+    values = [metadata.get(field, "")]
+    values += [alias.get(field, "") for alias in metadata.get("aliases", [])]
+    return [str(value) for value in dict.fromkeys(values) if value]
+
+
+def escape_tag_value(value: str) -> str:
+    """Escape a value so it can be used verbatim inside a tag filter."""
+    return _TAG_ESCAPE_PATTERN.sub(r"\\\1", value)
+
+
+def build_knn_query(
+    top_k: int, app: Optional[str] = None, article_type: Optional[str] = None
+) -> Query:
+    """
+    Build a hybrid KNN query: tag filters select the candidates, KNN ranks them.
+
+    Only chunk_id, item_id, title and the distance are returned so the full text
+    and the raw embedding never leave Redis.
+    """
+    filters = []
+    if app:
+        filters.append(f"@app:{{{escape_tag_value(app)}}}")
+    if article_type:
+        filters.append(f"@article_type:{{{escape_tag_value(article_type)}}}")
+    pre_filter = " ".join(filters) if filters else "*"
+
+    return (
+        Query(f"({pre_filter})=>[KNN {top_k} @embedding $vec AS vector_score]")
+        .sort_by("vector_score")
+        .return_fields("chunk_id", "item_id", "title", "vector_score")
+        .paging(0, top_k)
+        .dialect(2)
+    )
+
+
+class RedisVectorSearch(VectorSearchInterface):
+    def __init__(self, index_name: str = INDEX_NAME):
+        self.index_name: str = index_name
+
+    async def search(
+        self,
+        query_vector: List[float],
+        top_k: int = 5,
+        app: Optional[str] = None,
+        article_type: Optional[str] = None,
+        query_text: Optional[str] = None,
+    ) -> List[dict]:
+        query = build_knn_query(top_k, app, article_type)
+        params = {"vec": np.asarray(query_vector, dtype=np.float32).tobytes()}
+        search = get_async_redis_instance().ft(self.index_name)
+        with redis_command_duration.time(command="FT.SEARCH"):
+            result = await search.search(query, params)
+
+        # vector_score is the cosine distance, report the similarity instead
+        return [
+            {
+                "chunk_id": doc.chunk_id,
+                "item_id": doc.item_id,
+                "score": 1.0 - float(doc.vector_score),
+                "title": doc.title,
+            }
+            for doc in result.docs
+        ]
+
+
+def build_vector_search_files():
+    """
+    Write the files the configured numpy retriever maps, if missing or stale.
+
+    Run once before the server workers start: they only read the files, so
+    they share the same pages and never race to write them.
+    """
+    if SEARCH_BACKEND != "numpy":
+        return
+    from .embedding_store import save_normalized_embeddings
+
+    save_normalized_embeddings(DATA_LOCATION)
+    if EMBEDDING_QUANTIZATION == "int8":
+        from .quantized_search import save_quantized_embeddings
+
+        save_quantized_embeddings(DATA_LOCATION)
+    if EMBEDDING_PCA_DIM > 0:
+        from .pca_search import save_pca_embeddings
+
+        save_pca_embeddings(DATA_LOCATION, EMBEDDING_PCA_DIM)
+
+
+def vector_search_factory() -> VectorSearchInterface:
+    # imported here, these modules depend on this one
+    from .bm25 import BM25_INDEX_FILE, BM25Index
+    from .hybrid_search import HybridSearch
+
+    if EMBEDDING_PCA_DIM > 0 and EMBEDDING_QUANTIZATION != "none":
+        raise ValueError("EMBEDDING_PCA_DIM and EMBEDDING_QUANTIZATION are exclusive")
+    if SEARCH_BACKEND == "numpy" and EMBEDDING_PCA_DIM > 0:
+        from .pca_search import PCAVectorSearch
+
+        vector_search = PCAVectorSearch.from_folder(DATA_LOCATION, EMBEDDING_PCA_DIM)
+    elif SEARCH_BACKEND == "numpy" and EMBEDDING_QUANTIZATION == "int8":
+        from .quantized_search import QuantizedVectorSearch
+
+        vector_search = QuantizedVectorSearch.from_folder(
+            DATA_LOCATION, QUANTIZED_RERANK_FACTOR
+        )
+    elif SEARCH_BACKEND == "numpy":
+        from .numpy_search import NumpyVectorSearch
+
+        vector_search = NumpyVectorSearch.from_folder(DATA_LOCATION)
+    elif SEARCH_BACKEND == "redis":
+        vector_search = RedisVectorSearch(INDEX_NAME)
+    else:
+        raise ValueError(
+            f"Unsupported SEARCH_BACKEND '{SEARCH_BACKEND}', expected redis or numpy"
+        )
+
+    if not HYBRID_SEARCH_ENABLED:
+        return vector_search
+    if not os.path.exists(os.path.join(DATA_LOCATION, BM25_INDEX_FILE)):
+        logger.warning(
+            "No %s in %s, hybrid search disabled", BM25_INDEX_FILE, DATA_LOCATION
+        )
+        return vector_search
+    return HybridSearch(
+        vector_search,
+        BM25Index.load(DATA_LOCATION),
+        rrf_k=HYBRID_RRF_K,
+        candidates=HYBRID_CANDIDATES,
+    )
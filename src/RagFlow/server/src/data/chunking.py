@@ -0,0 +1,103 @@
+from typing import TYPE_CHECKING, List
+
+from ..core.common.config import CHUNK_MAX_TOKENS, CHUNK_OVERLAP
+from ..core.common.utils import estimate_tokens
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def make_chunk_id(item_id, chunk_index: int) -> str:
+    return f"{item_id}-{chunk_index}"
+
+
+def chunk_text(
+    text: str, max_tokens: int = CHUNK_MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP
+) -> List[str]:
+    """
+    Split a text into overlapping chunks of at most `max_tokens` estimated tokens.
+
+    Chunks end on word boundaries. Each chunk after the first starts with the
+    last words of the previous one, up to `overlap_tokens`, so the text around
+    a boundary keeps its context in both chunks. A text that fits is
+    returned unchanged as a single chunk. A word longer than the limit (e.g. an
+    inline base64 blob) is cut into fixed-size slices.
+
+    Example:
+        >>> chunk_text("a b c d e f g h i j k l m n o p", max_tokens=6, overlap_tokens=2)
+        ['a b c d e f', 'e f g h i j', 'i j k l m n', 'm n o p']
+    """
+    if overlap_tokens >= max_tokens:
+        raise ValueError("overlap_tokens must be smaller than max_tokens")
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    # estimate_tokens counts one token per 3 bytes, plus one
+    max_chars = max(1, (max_tokens - 1) * 3 // 4)  # a char is at most 4 bytes
+    words = [
+        word[i : i + max_chars]
+        for word in text.split()
+        for i in range(0, len(word), max_chars)
+    ]
+    word_tokens = [estimate_tokens(word + " ") for word in words]
+
+    chunks = []
+    start = 0
+    while start < len(words):
+        end = start
+        tokens = 0
+        while end < len(words) and (
+            end == start or tokens + word_tokens[end] <= max_tokens
+        ):
+            tokens += word_tokens[end]
+            end += 1
+        chunks.append(" ".join(words[start:end]))
+        if end == len(words):
+            break
+
+        # step back over the overlap, but always move forward by one word
+        next_start = end
+        overlap = 0
+        while (
+            next_start - 1 > start
+            and overlap + word_tokens[next_start - 1] <= overlap_tokens
+        ):
+            next_start -= 1
+            overlap += word_tokens[next_start]
+        start = next_start
+    return chunks
+
+
+def chunk_documents(
+    data: "pd.DataFrame",
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP,
+) -> "pd.DataFrame":
+    """
+    Split every document of `data` into chunks with chunk_text.
+
+    Each chunk becomes a row carrying the columns of its document (item_id,
+    title, application, ...) with `text` replaced by the chunk text, plus:
+        - chunk_id: "<item_id>-<chunk_index>", the key of the chunk in the
+          embedding store, the metadata and Redis
+        - chunk_index: Position of the chunk in its document, from 0
+
+    Returns:
+        pd.DataFrame: One row per chunk, documents and chunks in order
+    """
+    import pandas as pd
+
+    rows = []
+    for document in data.to_dict("records"):
+        chunks = chunk_text(document["text"], max_tokens, overlap_tokens)
+        for chunk_index, chunk in enumerate(chunks):
+            rows.append(
+                {
+                    **document,
+                    "chunk_id": make_chunk_id(document["item_id"], chunk_index),
+                    "chunk_index": chunk_index,
+                    "text": chunk,
+                }
+            )
+    columns = ["chunk_id", "chunk_index", *data.columns]
+    return pd.DataFrame(rows, columns=columns)
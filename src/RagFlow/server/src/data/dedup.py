@@ -0,0 +1,148 @@
+import re
+import zlib
+from collections import defaultdict
+from typing import TYPE_CHECKING, List, Tuple
+
+import numpy as np
+
+from ..core.common.config import DEDUP_NUM_PERM, DEDUP_SHINGLE_SIZE, DEDUP_THRESHOLD
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# universal hashing (a * x + b) mod p, with x < p < 2**31 the products fit in uint64
+_MERSENNE_PRIME = (1 << 31) - 1
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def shingles(text: str, size: int = DEDUP_SHINGLE_SIZE) -> set:
+    """Hashes of the overlapping `size`-word windows of the lowercased text."""
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        windows = [" ".join(words)]
+    else:
+        windows = [" ".join(words[i : i + size]) for i in range(len(words) - size + 1)]
+    return {zlib.crc32(window.encode("utf-8")) % _MERSENNE_PRIME for window in windows}
+
+
+class MinHasher:
+    """
+    MinHash signatures: the Jaccard similarity of two shingle sets is estimated
+    by the fraction of the `num_perm` hash functions on which their minimums agree.
+    """
+
+    def __init__(self, num_perm: int = DEDUP_NUM_PERM, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.num_perm: int = num_perm
+        self.a: np.ndarray = rng.integers(1, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self.b: np.ndarray = rng.integers(0, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_set: set) -> np.ndarray:
+        values = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set))
+        hashes = (np.outer(values, self.a) + self.b) % _MERSENNE_PRIME
+        return hashes.min(axis=0)
+
+
+def lsh_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    (bands, rows) with bands * rows == num_perm whose LSH threshold
+    (1 / bands) ** (1 / rows) is the closest one at or below `threshold`, so
+    pairs above it are almost always candidates.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+def find_duplicate_clusters(
+    texts: List[str],
+    threshold: float = DEDUP_THRESHOLD,
+    num_perm: int = DEDUP_NUM_PERM,
+) -> List[List[int]]:
+    """
+    Group the texts whose estimated Jaccard similarity is at least `threshold`.
+
+    Signatures are cut into bands; texts sharing a band bucket are candidates,
+    which avoids comparing all the pairs. Candidates are confirmed on their
+    full signatures and merged transitively (union-find).
+
+    Returns:
+        List[List[int]]: Clusters of two or more positions, each sorted
+    """
+    hasher = MinHasher(num_perm)
+    signatures = np.stack([hasher.signature(shingles(text)) for text in texts])
+    bands, rows = lsh_bands(threshold, num_perm)
+
+    parent = list(range(len(texts)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(bands):
+        buckets = defaultdict(list)
+        band_signatures = signatures[:, band * rows : (band + 1) * rows]
+        for position, band_signature in enumerate(band_signatures):
+            buckets[band_signature.tobytes()].append(position)
+        for candidates in buckets.values():
+            first = candidates[0]
+            for other in candidates[1:]:
+                if find(first) == find(other):
+                    continue
+                similarity = np.mean(signatures[first] == signatures[other])
+                if similarity >= threshold:
+                    parent[find(other)] = find(first)
+
+    clusters = defaultdict(list)
+    for position in range(len(texts)):
+        clusters[find(position)].append(position)
+    return [members for members in clusters.values() if len(members) > 1]
+
+
+def deduplicate_documents(
+    data: "pd.DataFrame",
+    threshold: float = DEDUP_THRESHOLD,
+    num_perm: int = DEDUP_NUM_PERM,
+) -> "pd.DataFrame":
+    """
+    Drop near-duplicate documents before they are chunked and embedded.
+
+    Documents are compared on their title and text with MinHash/LSH. From
+    each cluster of near-duplicates the first document is kept as the
+    canonical copy; the others are dropped and listed in its `aliases` column
+    as {"item_id", "app", "article_type"} dicts, so retrieval can
+    still filter on their tags. Documents without duplicates get an empty list.
+
+    Returns:
+        pd.DataFrame: The canonical documents, in their original order
+    """
+    data = data.reset_index(drop=True)
+    texts = (data["title"].fillna("") + " " + data["text"].fillna("")).tolist()
+    clusters = find_duplicate_clusters(texts, threshold, num_perm)
+
+    aliases = [[] for _ in range(len(data))]
+    dropped = []
+    for canonical, *duplicates in clusters:
+        for position in duplicates:
+            aliases[canonical].append(
+                {
+                    "item_id": str(data.at[position, "item_id"]),
+                    "app": data.at[position, "application"],
+                    "article_type": data.at[position, "article_type"],
+                }
+            )
+        dropped.extend(duplicates)
+
+    data = data.assign(aliases=aliases).drop(index=dropped).reset_index(drop=True)
+    print(
+        f"Deduplication: {len(dropped)} near-duplicate documents folded into "
+        f"{len(clusters)} canonical ones, {len(data)} documents left"
+    )
+    return data
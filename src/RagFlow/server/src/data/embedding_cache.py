@@ -0,0 +1,83 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+# SQLite caps the number of bound parameters per statement
+_LOOKUP_CHUNK_SIZE = 500
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache stored in a local SQLite file.
+
+    Entries are keyed by sha256(model + text), so a text is only embedded again
+    when its content or the embedding model changes. Vectors are stored as
+    float32 blobs, the same precision as the embedding store.
+
+    Example:
+        >>> cache = EmbeddingCache("embedding_cache.sqlite3", "text-embedding-ada-002")
+        >>> cache.put_many({"hello": [0.1, 0.2]})
+        >>> cache.get_many(["hello", "unknown"])
+        {'hello': [0.1, 0.2]}
+    """
+
+    def __init__(self, path: str, model: str):
+        self.path: str = path
+        self.model: str = model
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, "
+            "embedding BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def make_key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: Iterable[str]) -> Dict[str, List[float]]:
+        """Return the cached embeddings of `texts`, missing texts are left out."""
+        text_by_key = {self.make_key(text): text for text in texts}
+        keys = list(text_by_key)
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_CHUNK_SIZE):
+                chunk = keys[start : start + _LOOKUP_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, embedding FROM embeddings WHERE key IN ({placeholders})",
+                    chunk,
+                )
+                for key, blob in rows:
+                    found[text_by_key[key]] = np.frombuffer(
+                        blob, dtype=np.float32
+                    ).tolist()
+        return found
+
+    def put_many(self, embeddings: Dict[str, List[float]]):
+        now = time.time()
+        rows = [
+            (
+                self.make_key(text),
+                self.model,
+                np.asarray(vector, dtype=np.float32).tobytes(),
+                now,
+            )
+            for text, vector in embeddings.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, embedding, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
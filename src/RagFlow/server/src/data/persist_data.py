@@ -1,5 +1,7 @@
 import json
 import os
+import time
+
 import numpy as np
 import redis
 from redis.commands.search.field import (
@@ -8,47 +10,190 @@ from redis.commands.search.field import (
 )
 from redis.commands.search.index_definition import IndexDefinition, IndexType
 
-from .prepare_data import read_data
+from ..core.common.config import (
+    FLAT_BLOCK_SIZE,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_RUNTIME,
+    HNSW_M,
+    INDEX_NAME,
+    INDEX_TYPE,
+    REDIS_BATCH_SIZE,
+    REDIS_DOC_PREFIX,
+    VECTOR_DIM,
+    VECTOR_DISTANCE_METRIC,
+)
+from ..core.common.conn import get_redis_instance
+from ..core.common.metrics import redis_command_duration
+from ..core.retrieval.embedding_store import (
+    EMBEDDINGS_FILE,
+    LEGACY_EMBEDDINGS_FILE,
+    EmbeddingStore,
+    embedding_store_exists,
+    save_embedding_store,
+)
+from ..core.retrieval.vector_search import tag_values
+from .prepare_data import read_data, script_dir
+
+
+def persist_data(
+    embeddings_data: EmbeddingStore,
+    metadata_data: list,
+    chunk_size: int = REDIS_BATCH_SIZE,
+):
+    """
+    Write every chunk embedding and its metadata into Redis hashes.
 
-# from ..core.common.config import REDIS_URL
+    Each chunk is stored under the key `doc:<chunk_id>` with its embedding packed
+    as float32 bytes (the layout RediSearch expects for vector fields) next to its
+    metadata fields, including the item_id of its document. Writes are sent
+    through non-transactional pipelines, one pipeline per `chunk_size` hashes
+    (unrelated to the document chunks), so a full load costs
+    len(embeddings_data) / chunk_size round trips instead of one per key.
+    Store rows are already float32, so packing a vector is a plain memory copy.
 
-REDIS_URL = os.getenv("REDIS_URL")
+    Args:
+        embeddings_data (EmbeddingStore): The embedding matrix and its item_ids
+        metadata_data (list): Items of the form {"chunk_id": ..., "metadata": {...}}
+        chunk_size (int): Number of hashes written per pipeline round trip
 
-redis_conn = redis.from_url(REDIS_URL)
-print(redis_conn.ping())
+    Returns:
+        int: The number of chunks written
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer")
 
-def persist_data(embeddings_data: list, metadata_data: list):
-    pass
+    # Index the metadata by chunk_id so each embedding finds its fields in O(1)
+    metadata_by_id = {str(item["chunk_id"]): item["metadata"] for item in metadata_data}
 
+    redis_conn = get_redis_instance()
+    total_written = 0
+    load_start = time.perf_counter()
+    for batch_start in range(0, len(embeddings_data), chunk_size):
+        batch_ids = embeddings_data.ids[batch_start : batch_start + chunk_size]
+        batch_vectors = embeddings_data.matrix[batch_start : batch_start + chunk_size]
+        batch_start_time = time.perf_counter()
 
-def read_embeddings_data():
-    folder_path = "src\RagFlow\server\src\data"
-    with open(os.path.join(folder_path, "embeddings.json"), "r") as f:
-        embeddings_data = json.load(f)
-    return embeddings_data
+        # transaction=False skips MULTI/EXEC, we only want the batching
+        pipe = redis_conn.pipeline(transaction=False)
+        for chunk_id, vector in zip(batch_ids, batch_vectors):
+            chunk_id = str(chunk_id)
+            mapping = {
+                "chunk_id": chunk_id,
+                "embedding": np.ascontiguousarray(vector, dtype=np.float32).tobytes(),
+            }
+            metadata = metadata_by_id.get(chunk_id, {})
+            mapping.update(metadata)
+            # tag fields hold the values of the aliases too, "," separated
+            for field in ("app", "article_type"):
+                mapping[field] = ",".join(tag_values(metadata, field))
+            mapping["aliases"] = json.dumps(metadata.get("aliases", []))
+            pipe.hset(f"{REDIS_DOC_PREFIX}{chunk_id}", mapping=mapping)
+        with redis_command_duration.time(command="PIPELINE_HSET"):
+            pipe.execute()
 
+        elapsed = time.perf_counter() - batch_start_time
+        total_written += len(batch_ids)
+        print(
+            f"Batch {batch_start // chunk_size + 1}: wrote {len(batch_ids)} chunks "
+            f"in {elapsed:.3f}s ({len(batch_ids) / max(elapsed, 1e-9):.0f} chunks/s)"
+        )
+
+    total_elapsed = time.perf_counter() - load_start
+    print(
+        f"Persisted {total_written} chunks in {total_elapsed:.3f}s "
+        f"({total_written / max(total_elapsed, 1e-9):.0f} chunks/s)"
+    )
+    return total_written
+
+
+def read_embeddings_data() -> EmbeddingStore:
+    """
+    Load the binary embedding store, migrating a legacy embeddings.json once.
+    """
+    if not embedding_store_exists(script_dir):
+        legacy_store = EmbeddingStore.from_legacy_json(script_dir)
+        save_embedding_store(script_dir, legacy_store.ids, legacy_store.matrix)
+        print(f"Migrated {LEGACY_EMBEDDINGS_FILE} to {EMBEDDINGS_FILE}")
+    return EmbeddingStore.load(script_dir)
 
 
 def read_metadata_data():
-    folder_path = "src\RagFlow\server\src\data"
-    with open(os.path.join(folder_path, "metadata.json"), "r") as f:
+    with open(os.path.join(script_dir, "metadata.json"), "r") as f:
         metadata_data = json.load(f)
     return metadata_data
 
-def create_index(embeddings_data, metadata_data):
-    pass
+
+def get_vector_field(vector_dim: int = VECTOR_DIM) -> VectorField:
+    """
+    Build the `embedding` vector field for the configured index type.
+
+    HNSW is an approximate graph index: M bounds the edges per node,
+    EF_CONSTRUCTION the candidate list while building and EF_RUNTIME the
+    candidate list while querying. FLAT is an exact brute-force index whose
+    vectors are allocated in blocks of BLOCK_SIZE.
+    """
+    attributes = {
+        "TYPE": "FLOAT32",
+        "DIM": vector_dim,
+        "DISTANCE_METRIC": VECTOR_DISTANCE_METRIC,
+    }
+    index_type = INDEX_TYPE.upper()
+    if index_type == "HNSW":
+        attributes.update(
+            {
+                "M": HNSW_M,
+                "EF_CONSTRUCTION": HNSW_EF_CONSTRUCTION,
+                "EF_RUNTIME": HNSW_EF_RUNTIME,
+            }
+        )
+    elif index_type == "FLAT":
+        attributes["BLOCK_SIZE"] = FLAT_BLOCK_SIZE
+    else:
+        raise ValueError(
+            f"Unsupported VECSIM_INDEX_TYPE '{INDEX_TYPE}', expected HNSW or FLAT"
+        )
+    return VectorField("embedding", index_type, attributes)
+
+
+def create_index(vector_dim: int = VECTOR_DIM) -> bool:
+    """
+    Create the RediSearch index over the `doc:` hashes written by persist_data.
+
+    `app` and `article_type` are tag fields so they can be used as exact-match
+    pre-filters in KNN queries. The index is left untouched if it already exists.
+
+    Returns:
+        bool: True if the index was created, False if it already existed
+    """
+    search = get_redis_instance().ft(INDEX_NAME)
+    try:
+        search.info()
+        print(f"Index {INDEX_NAME} already exists.")
+        return False
+    except redis.ResponseError:
+        pass
+
+    schema = (
+        TagField("app"),
+        TagField("article_type"),
+        get_vector_field(vector_dim),
+    )
+    definition = IndexDefinition(prefix=[REDIS_DOC_PREFIX], index_type=IndexType.HASH)
+    search.create_index(fields=schema, definition=definition)
+    print(f"Created {INDEX_TYPE} index {INDEX_NAME} (dim={vector_dim})")
+    return True
+
 
 def load_data():
     # we want to load data only if the database is empty
-    if redis_conn.dbsize() > 5000:
+    if get_redis_instance().dbsize() > 5000:
         print("Database is not empty. Data is already loaded.")
         return None
     embeddings_data = read_embeddings_data()
     metadata_data = read_metadata_data()
     persist_data(embeddings_data, metadata_data)
-    create_index(embeddings_data, metadata_data)
+    create_index(embeddings_data.dim)
+
 
 if __name__ == "__main__":
-    persist_data()
     load_data()
-
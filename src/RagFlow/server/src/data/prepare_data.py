@@ -1,20 +1,67 @@
 import json
 import os
-from typing import List
-
-import pandas as pd
-
-from ..core.common.config import OPENAI_API_KEY
-from ..core.llm.openapi_client import OpenAPIClient
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, List, Optional
+
+import numpy as np
+
+from ..core.common import config
+from ..core.common.config import (
+    DEDUP_ENABLED,
+    EMBEDDING_CACHE_FILE,
+    EMBEDDING_CONCURRENCY,
+    EMBEDDING_MAX_BATCH_ITEMS,
+    EMBEDDING_MAX_BATCH_TOKENS,
+    EMBEDDING_MAX_INPUT_TOKENS,
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_PCA_DIM,
+    EMBEDDING_QUANTIZATION,
+    OPENAI_EMBEDDING_RPM,
+    OPENAI_EMBEDDING_TPM,
+)
+from ..core.common.metrics import embedding_batch_size
+from ..core.common.rate_limit import RateLimiter
+from ..core.common.utils import estimate_tokens
+from ..core.llm.openapi_client import OpenAPIClient, is_retryable_openai_error
+from ..core.llm.utils import OpenAIError
+from ..core.retrieval.bm25 import BM25_INDEX_FILE, BM25Index
+from ..core.retrieval.embedding_store import EMBEDDINGS_FILE, save_embedding_store
+from ..core.retrieval.evaluation import format_report
+from ..core.retrieval.pca_search import (
+    PCA_REPORT_DIMENSIONS,
+    pca_report,
+    save_pca_embeddings,
+)
+from ..core.retrieval.quantized_search import (
+    quantization_report,
+    save_quantized_embeddings,
+)
+from .chunking import chunk_documents, chunk_text
+from .dedup import deduplicate_documents
+from .embedding_cache import EmbeddingCache
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 # Get the directory where the script is located
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
+_openai_client: Optional[OpenAPIClient] = None
+
 
-openai_client = OpenAPIClient(api_key=OPENAI_API_KEY)
+def get_openai_client() -> OpenAPIClient:
+    """Build the embeddings client on first use, importing this module needs no key."""
+    global _openai_client
 
+    if _openai_client is None:
+        _openai_client = OpenAPIClient(api_key=config.OPENAI_API_KEY)
+    return _openai_client
+
+
+def read_data() -> "pd.DataFrame":
+    import pandas as pd
 
-def read_data() -> pd.DataFrame:
     data_file = os.path.join(script_dir, "source_data.json")
     data_source = pd.read_json(data_file)
     return data_source
@@ -55,212 +102,363 @@ def get_openai_embeddings(docs_batch: List[dict]):
         - Each vector is normalized to have a magnitude of 1
         - The function processes documents in batches for efficiency
     """
-    # Initialize lists to store texts and their corresponding IDs
-    texts = []
-    ids = []
-
-    # Extract text content and IDs from each document
-    for doc in docs_batch:
-        texts.append(doc["text"])
-        ids.append(doc["item_id"])
+    # Extract text content and IDs for the whole batch
+    texts = [doc["text"] for doc in docs_batch]
+    ids = [doc["item_id"] for doc in docs_batch]
 
     # Get embeddings for all texts in a single API call
-    embeddings = openai_client.get_embeddings(texts)
+    embeddings = get_openai_client().get_embeddings(texts)
+
+    # Map document IDs to their embeddings, the API keeps the input order
+    return dict(zip(ids, embeddings))
+
+
+def batch_documents(
+    docs: List[dict],
+    max_batch_tokens: int = EMBEDDING_MAX_BATCH_TOKENS,
+    max_batch_items: int = EMBEDDING_MAX_BATCH_ITEMS,
+    max_input_tokens: int = EMBEDDING_MAX_INPUT_TOKENS,
+) -> List[List[dict]]:
+    """
+    Pack documents into as few embedding requests as the API limits allow.
+
+    Documents are chunked before they get here (CHUNK_MAX_TOKENS). As a
+    safety net, a text still over `max_input_tokens` is split with chunk_text,
+    without overlap, and generate_embeddings averages its pieces back into
+    one vector. The inputs are then packed in order into batches, a batch
+    being closed as soon as the next input would push it over
+    `max_batch_tokens` estimated tokens or `max_batch_items` inputs.
+
+    Args:
+        docs (List[dict]): Documents with "item_id" and "text" keys
 
-    # Create a dictionary mapping document IDs to their embeddings
-    results = {}
-    for i, doc in enumerate(docs_batch):
-        results[ids[i]] = embeddings[i]
+    Returns:
+        List[List[dict]]: Batches of inputs, each input a dict with:
+            - "item_id" (tuple): (document item_id, piece index)
+            - "text" (str): The text to embed
+            - "tokens" (int): The estimated token count of the text
+    """
+    batches = []
+    batch = []
+    batch_tokens = 0
+    for doc in docs:
+        for part, text in enumerate(
+            chunk_text(doc["text"], max_input_tokens, overlap_tokens=0)
+        ):
+            tokens = estimate_tokens(text)
+            if batch and (
+                batch_tokens + tokens > max_batch_tokens
+                or len(batch) >= max_batch_items
+            ):
+                batches.append(batch)
+                batch = []
+                batch_tokens = 0
+            batch.append(
+                {"item_id": (doc["item_id"], part), "text": text, "tokens": tokens}
+            )
+            batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def combine_piece_embeddings(vectors: List[list], weights: List[int]) -> list:
+    """
+    Merge the embeddings of the pieces of a split document into one vector.
 
-    return results
+    The pieces are averaged weighted by their token count and the result is
+    normalized back to unit length, like the embeddings returned by the API.
+    """
+    if len(vectors) == 1:
+        return vectors[0]
+    combined = np.average(np.asarray(vectors), axis=0, weights=weights)
+    return (combined / np.linalg.norm(combined)).tolist()
 
 
-def generate_embeddings(data: pd.DataFrame) -> dict:
+def embed_batch_with_rate_limit(
+    docs_batch: List[dict],
+    rate_limiter: RateLimiter,
+    max_retries: int = EMBEDDING_MAX_RETRIES,
+) -> dict:
     """
-    Generates embeddings for all items in the input DataFrame.
+    Embed one batch once the rate limiter allows it, backing off on 429s,
+    server errors and connection failures.
 
-    Process:
-    1. Processes data in batches of 100 items to avoid API rate limits
-    2. For each batch:
-       - Collects items into a batch
-       - Calls OpenAI API to get embeddings
-       - Updates the master dictionary of all embeddings
-    3. Handles any remaining items after the last complete batch
+    The batch pays one request and its estimated token count to the limiter
+    before every attempt. A retryable error pauses all workers sharing the
+    limiter, with a pause that grows on consecutive errors and lasts at least
+    the Retry-After of a 429. Other client errors are raised at once.
 
     Args:
-        data (pd.DataFrame): Input data containing items to be embedded
+        docs_batch (List[dict]): A batch from batch_documents
+        rate_limiter (RateLimiter): Limiter shared by all workers
+        max_retries (int): Number of retries before giving up
 
     Returns:
         dict: Dictionary mapping item IDs to their vector embeddings
     """
-    all_vectors = {}  # Master dictionary to store all embeddings
-    text_batch = []  # Temporary list to hold current batch of items
-    item_ids = []  # List to track item IDs in current batch
-
-    # Process data in batches of 100 items
-    for index, row in data.iterrows():
-        text_batch.append(row)  # Add the current item to the batch
-        if index % 100 == 0:  # Process batch when we reach 100 items
-            text_vectors = get_openai_embeddings(
-                text_batch
-            )  # Get embeddings for the current batch
-            all_vectors.update(
-                text_vectors
-            )  # Update the master dictionary with the new embeddings
-            text_batch.clear()  # Clear batch after processing
-            item_ids.clear()  # Clear item IDs after processing
-
-    # Process any remaining items that didn't make a complete batch
-    if len(text_batch) > 0:
-        text_vectors = get_openai_embeddings(text_batch)
-        all_vectors.update(text_vectors)
+    tokens = sum(doc["tokens"] for doc in docs_batch)
+    embedding_batch_size.observe(len(docs_batch), source="ingest")
+    for attempt in range(max_retries + 1):
+        rate_limiter.acquire(tokens)
+        try:
+            text_vectors = get_openai_embeddings(docs_batch)
+        except OpenAIError as e:
+            if not is_retryable_openai_error(e) or attempt == max_retries:
+                raise
+            rate_limiter.backoff(getattr(e, "retry_after", None))
+            continue
+        rate_limiter.record_success()
+        return text_vectors
+
+
+def generate_embeddings(
+    data: "pd.DataFrame",
+    max_workers: int = EMBEDDING_CONCURRENCY,
+    cache: Optional[EmbeddingCache] = None,
+) -> dict:
+    """
+    Generates embeddings for all the chunks in the input DataFrame.
+
+    Process:
+    1. Looks every text up in the embedding cache, if one is given; only the
+       new or changed texts are sent to the API
+    2. Packs the remaining documents into token-budgeted batches with
+       batch_documents, splitting documents that exceed the per-input limit
+    3. Sends up to `max_workers` batches concurrently, each worker waiting on a
+       shared token-bucket limiter that enforces the requests-per-minute and
+       tokens-per-minute quotas (OPENAI_EMBEDDING_RPM / OPENAI_EMBEDDING_TPM)
+    4. As batches complete, combines the pieces of split documents and stores
+       every document in the cache as soon as all its pieces are in, so a
+       failed run keeps the embeddings it paid for. After a failure the batches
+       not started yet are cancelled, the ones in flight are still stored, then
+       the error is raised
+    5. Returns the vectors in the documents order, so the output is the same
+       as a serial run
+
+    Args:
+        data (pd.DataFrame): Chunks to be embedded, from chunk_documents
+        max_workers (int): Maximum number of batches in flight
+        cache (Optional[EmbeddingCache]): Cache of embeddings keyed by text hash
+
+    Returns:
+        dict: Dictionary mapping chunk IDs to their vector embeddings
+    """
+    # batch_documents keys its inputs by "item_id", here the chunk_id
+    docs = (
+        data[["chunk_id", "text"]]
+        .rename(columns={"chunk_id": "item_id"})
+        .to_dict("records")
+    )
+    cached_vectors = cache.get_many(doc["text"] for doc in docs) if cache else {}
+    missing_docs = [doc for doc in docs if doc["text"] not in cached_vectors]
+    batches = batch_documents(missing_docs)
+    print(
+        f"Embedding {len(missing_docs)} documents in {len(batches)} requests "
+        f"({len(docs) - len(missing_docs)} cached)"
+    )
+
+    text_by_id = {doc["item_id"]: doc["text"] for doc in missing_docs}
+    piece_counts = Counter(piece["item_id"][0] for batch in batches for piece in batch)
+    # item_id -> ([piece vectors], [piece token counts])
+    pieces_by_id = {}
+    new_vectors = {}
+    error = None
+    rate_limiter = RateLimiter(OPENAI_EMBEDDING_RPM, OPENAI_EMBEDDING_TPM)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(embed_batch_with_rate_limit, batch, rate_limiter): batch
+            for batch in batches
+        }
+        for future in as_completed(futures):
+            try:
+                text_vectors = future.result()
+            except Exception as e:
+                if error is None:
+                    error = e
+                    for pending in futures:
+                        pending.cancel()
+                continue
+            completed = {}
+            for piece in futures[future]:
+                item_id, _ = piece["item_id"]
+                vectors, weights = pieces_by_id.setdefault(item_id, ([], []))
+                vectors.append(text_vectors[piece["item_id"]])
+                weights.append(piece["tokens"])
+                if len(vectors) == piece_counts[item_id]:
+                    new_vectors[item_id] = combine_piece_embeddings(vectors, weights)
+                    completed[text_by_id[item_id]] = new_vectors[item_id]
+                    del pieces_by_id[item_id]
+            if cache and completed:
+                cache.put_many(completed)
+    if error is not None:
+        raise error
+
+    # keep the documents order
+    all_vectors = {
+        doc["item_id"]: cached_vectors.get(doc["text"]) or new_vectors[doc["item_id"]]
+        for doc in docs
+    }
 
     print("Length of all_vectors: ", len(all_vectors))
     print("Length of data: ", len(data))
     return all_vectors
 
 
-def save_embeddings_to_json(doc_data: pd.DataFrame, embeddings: dict):
+def save_embeddings(doc_data: "pd.DataFrame", embeddings: dict):
     """
-    Save document embeddings to a JSON file along with their corresponding item IDs.
+    Save chunk embeddings in the binary embedding store, in chunk order.
 
-    This function takes the original document data and their embeddings, combines them,
-    and saves them to a JSON file in a structured format. The output JSON will contain
-    an array of objects, each with an item_id and its corresponding embedding vector.
+    The vectors are written as one contiguous float32 matrix (embeddings.npy) and
+    the chunk_ids as a row-aligned index (embedding_ids.npy), see
+    core.retrieval.embedding_store. Both files can be memory-mapped by readers.
 
     Args:
-        doc_data (pd.DataFrame): DataFrame containing the original documents with columns:
-            - item_id: Unique identifier for each document
-        embeddings (dict): Dictionary mapping item_ids to their embedding vectors
+        doc_data (pd.DataFrame): DataFrame of chunks, from chunk_documents, with columns:
+            - chunk_id: Unique identifier for each chunk
+        embeddings (dict): Dictionary mapping chunk_ids to their embedding vectors
 
     Example:
         >>> doc_data = pd.DataFrame({
-        ...     "item_id": ["doc1", "doc2"],
+        ...     "chunk_id": ["doc1-0", "doc1-1"],
         ...     "text": ["sample text 1", "sample text 2"]
         ... })
         >>> embeddings = {
-        ...     "doc1": [0.1, 0.2, 0.3, ...],  # 1536-dimensional vector
-        ...     "doc2": [0.4, 0.5, 0.6, ...]   # 1536-dimensional vector
+        ...     "doc1-0": [0.1, 0.2, 0.3, ...],  # 1536-dimensional vector
+        ...     "doc1-1": [0.4, 0.5, 0.6, ...]   # 1536-dimensional vector
         ... }
-        >>> save_embeddings_to_json(doc_data, embeddings)
-        # Creates embeddings.json with content:
-        # [
-        #     {
-        #         "item_id": "doc1",
-        #         "embedding": [0.1, 0.2, 0.3, ...]
-        #     },
-        #     {
-        #         "item_id": "doc2",
-        #         "embedding": [0.4, 0.5, 0.6, ...]
-        #     }
-        # ]
+        >>> save_embeddings(doc_data, embeddings)
+        # Creates embeddings.npy, a (2, 1536) float32 matrix, and
+        # embedding_ids.npy, the array ["doc1-0", "doc1-1"]
     """
-    # Initialize list to store combined document and embedding data
-    data_embeddings = []
-
-    # Combine document IDs with their corresponding embeddings
-    for index, row in doc_data.iterrows():
-        data_embeddings.append(
-            {"item_id": row["item_id"], "embedding": embeddings[row["item_id"]]}
-        )
-
-    # Convert the data to a formatted JSON string with indentation
-    data_json = json.dumps(data_embeddings, indent=4)
-
-    # Define the output directory path
-    folder_path = "src\RagFlow\server\src\data"
-    # Create the directory if it doesn't exist
-    os.makedirs(folder_path, exist_ok=True)
-
-    # Write the JSON data to file
-    with open(os.path.join(folder_path, "embeddings.json"), "w") as f:
-        f.write(data_json)
-    print(f"Embeddings saved to {folder_path}/embeddings.json")
+    chunk_ids = doc_data["chunk_id"].tolist()
+    save_embedding_store(
+        script_dir, chunk_ids, [embeddings[chunk_id] for chunk_id in chunk_ids]
+    )
+    print(f"Embeddings saved to {script_dir}/{EMBEDDINGS_FILE}")
 
 
 def save_metadata_to_json(data):
     """
-    Save document metadata to a JSON file in a structured format.
+    Save chunk metadata to a JSON file in a structured format.
 
-    This function takes a DataFrame containing document data and extracts relevant metadata
-    fields (title, text, application, article_type) along with their item_ids. The metadata
-    is saved to a JSON file in a structured format that can be easily used for document
-    retrieval and display.
+    This function takes a DataFrame of chunks and extracts relevant metadata
+    fields (parent item_id, chunk_index, title, text, application, article_type)
+    along with their chunk_ids. The metadata is saved to a JSON file in a
+    structured format that can be easily used for retrieval and display.
 
     Args:
-        data (pd.DataFrame): DataFrame containing document data with columns:
-            - item_id: Unique identifier for each document
+        data (pd.DataFrame): DataFrame of chunks, from chunk_documents, with columns:
+            - chunk_id: Unique identifier for each chunk
+            - chunk_index: Position of the chunk in its document
+            - item_id: Identifier of the document the chunk belongs to
             - title: Document title
-            - text: Document content
+            - text: Chunk content
             - application: Application name/type
             - article_type: Type of article/document
+            - aliases: Near-duplicate documents folded into this one, see
+              deduplicate_documents
 
     Example:
         >>> data = pd.DataFrame({
-        ...     "item_id": ["doc1", "doc2"],
-        ...     "title": ["Sample Title 1", "Sample Title 2"],
+        ...     "chunk_id": ["doc1-0", "doc1-1"],
+        ...     "chunk_index": [0, 1],
+        ...     "item_id": ["doc1", "doc1"],
+        ...     "title": ["Sample Title 1", "Sample Title 1"],
         ...     "text": ["Content 1", "Content 2"],
-        ...     "application": ["App1", "App2"],
-        ...     "article_type": ["Type1", "Type2"]
+        ...     "application": ["App1", "App1"],
+        ...     "article_type": ["Type1", "Type1"],
+        ...     "aliases": [[], []]
         ... })
         >>> save_metadata_to_json(data)
         # Creates metadata.json with content:
         # [
         #     {
-        #         "item_id": "doc1",
+        #         "chunk_id": "doc1-0",
         #         "metadata": {
+        #             "item_id": "doc1",
+        #             "chunk_index": 0,
         #             "title": "Sample Title 1",
         #             "text": "Content 1",
         #             "app": "App1",
-        #             "article_type": "Type1"
+        #             "article_type": "Type1",
+        #             "aliases": []
         #         }
         #     },
-        #     {
-        #         "item_id": "doc2",
-        #         "metadata": {
-        #             "title": "Sample Title 2",
-        #             "text": "Content 2",
-        #             "app": "App2",
-        #             "article_type": "Type2"
-        #         }
-        #     }
+        #     ...
         # ]
     """
-    # Initialize list to store metadata for each document
-    metadata_list = []
-
-    # Extract and structure metadata for each document
-    for index, row in data.iterrows():
-        metadata_list.append(
-            {
-                "item_id": row["item_id"],
-                "metadata": {
-                    "title": row["title"],
-                    "text": row["text"],
-                    "app": row["application"],
-                    "article_type": row["article_type"],
-                },
-            }
-        )
+    # Extract the metadata columns once for the whole frame
+    metadata_records = (
+        data[
+            [
+                "item_id",
+                "chunk_index",
+                "title",
+                "text",
+                "application",
+                "article_type",
+                "aliases",
+            ]
+        ]
+        .astype({"item_id": str})
+        .rename(columns={"application": "app"})
+        .to_dict("records")
+    )
+    metadata_list = [
+        {"chunk_id": chunk_id, "metadata": metadata}
+        for chunk_id, metadata in zip(data["chunk_id"].tolist(), metadata_records)
+    ]
 
     # Convert the metadata to a formatted JSON string with indentation
     metadata_json = json.dumps(metadata_list, indent=4)
 
-    # Define the output directory path
-    folder_path = "src\RagFlow\server\src\data"
-    # Create the directory if it doesn't exist
-    os.makedirs(folder_path, exist_ok=True)
-
-    # Write the JSON data to file
-    with open(os.path.join(folder_path, "metadata.json"), "w") as f:
+    # Write the JSON data to file, next to the source data
+    with open(os.path.join(script_dir, "metadata.json"), "w") as f:
         f.write(metadata_json)
-    print(f"Metadata saved to {folder_path}/metadata.json")
+    print(f"Metadata saved to {script_dir}/metadata.json")
+
+
+def save_bm25_index(data):
+    """
+    Build the BM25 inverted index over the title and text of every chunk
+    and save it next to the embeddings, for the lexical half of hybrid search.
+    """
+    documents = (
+        data[
+            [
+                "chunk_id",
+                "item_id",
+                "title",
+                "text",
+                "application",
+                "article_type",
+                "aliases",
+            ]
+        ]
+        .rename(columns={"application": "app"})
+        .to_dict("records")
+    )
+    BM25Index.build(documents).save(script_dir)
+    print(f"BM25 index saved to {script_dir}/{BM25_INDEX_FILE}")
 
 
 def prepare_data():
-    data = read_data()
+    documents = read_data()
+    if DEDUP_ENABLED:
+        documents = deduplicate_documents(documents)
+    else:
+        documents = documents.assign(aliases=[[] for _ in range(len(documents))])
+    data = chunk_documents(documents)
     # print("Data: ", data.head())
-    embeddings = generate_embeddings(data)
+    cache = EmbeddingCache(
+        os.path.join(script_dir, EMBEDDING_CACHE_FILE),
+        get_openai_client().embedding_model,
+    )
+    try:
+        embeddings = generate_embeddings(data, cache=cache)
+    finally:
+        cache.close()
     # Print both the number of embeddings and their dimension size
     if embeddings:
         first_embedding = next(
@@ -270,8 +468,22 @@ def prepare_data():
         print(
             f"Embedding dimension size: {len(first_embedding)}"
         )  # 1536 is the dimension size of the embedding
-    save_embeddings_to_json(data, embeddings)
+    save_embeddings(data, embeddings)
     save_metadata_to_json(data)
+    save_bm25_index(data)
+    if EMBEDDING_QUANTIZATION == "int8":
+        save_quantized_embeddings(script_dir)
+        print(
+            format_report(
+                "int8 quantization (float32 matrix memory-mapped, read for the re-rank only):",
+                quantization_report(script_dir),
+            )
+        )
+    if EMBEDDING_PCA_DIM > 0:
+        save_pca_embeddings(script_dir, EMBEDDING_PCA_DIM)
+        # the saved width is always reported, next to the usual ones
+        dimensions = tuple(sorted({*PCA_REPORT_DIMENSIONS, EMBEDDING_PCA_DIM}))
+        print(format_report("PCA reduction:", pca_report(script_dir, dimensions)))
 
 
 if __name__ == "__main__":
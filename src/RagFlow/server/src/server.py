@@ -1,21 +1,39 @@
 import os
+import time
+from contextlib import asynccontextmanager
 
-import uvicorn
-from fastapi import APIRouter, FastAPI, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, Response
 from starlette.middleware.cors import CORSMiddleware
 from starlette.staticfiles import StaticFiles
 
 # from api.apps import apps_router
 # from api.common import common_router
 # from api.docs import docs_router
-from api.predict import predict_router
+from api.predict import get_llm_service, get_vector_search, predict_router
 
 # from api.user import user_router
 from core.common import config
+from core.common.conn import close_http_client, close_redis_pools
+from core.common.metrics import CONTENT_TYPE, REGISTRY, http_request_duration
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # build the services before the first request instead of at import time
+    get_llm_service()
+    get_vector_search()
+    yield
+    # release the pooled OpenAI and Redis connections
+    await close_http_client()
+    await close_redis_pools()
+
 
 app = FastAPI(
-    title=config.PROJECT_NAME, docs_url=config.API_DOCS, openapi_url=config.OPENAPI_DOCS
+    title=config.PROJECT_NAME,
+    docs_url=config.API_DOCS,
+    openapi_url=config.OPENAPI_DOCS,
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -26,6 +44,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    started_at = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # label by route template, not raw path, to keep cardinality bounded
+        route = request.scope.get("route")
+        http_request_duration.observe(
+            time.perf_counter() - started_at,
+            method=request.method,
+            route=route.path if route else "unmatched",
+            status=status,
+        )
+
+
 # Routers
 app.include_router(predict_router, prefix=config.API_V1_STR, tags=["api"])
 
@@ -47,6 +85,12 @@ app.include_router(predict_router, prefix=config.API_V1_STR, tags=["api"])
 # )
 root_router = r = APIRouter()
 
+
+@r.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
 app.include_router(root_router, prefix="", tags=["hello"])
 # app.include_router(
 #     common_router,
@@ -78,9 +122,25 @@ app.include_router(root_router, prefix="", tags=["hello"])
 
 
 if __name__ == "__main__":
+    import uvicorn
+
+    from core.retrieval.vector_search import build_vector_search_files
+
     env = os.environ.get("DEPLOYMENT", "dev")
     host = os.environ.get("SERVER_HOST", "127.0.0.1")
 
-    server_attr = {"host": host, "reload": True, "port": 8880, "workers": 1}
+    # once, before the workers start: they only memory-map the result, so the
+    # matrix is held once in the page cache whatever the count
+    build_vector_search_files()
+
+    if env == "prod":
+        server_attr = {
+            "host": host,
+            "reload": False,
+            "port": 8880,
+            "workers": config.SERVER_WORKERS,
+        }
+    else:
+        server_attr = {"host": host, "reload": True, "port": 8880, "workers": 1}
 
     uvicorn.run("server:app", **server_attr)